@@ -0,0 +1,65 @@
+"""JSON codec.
+
+It uses :py:mod:`orjson` when it is installed and falls back
+to :py:mod:`json` from the standard library otherwise.
+Both backends decode ``bytes`` directly and encode
+:py:class:`datetime.datetime`, :py:class:`datetime.date`,
+:py:class:`bson.ObjectId` and any other unsupported objects
+with :py:func:`str` (i.e. ``2020-01-01 12:00:00``),
+the same way as ``json.dumps(obj, default=str)``.
+
+Non-finite floats are encoded as ``null`` by :py:mod:`orjson`
+(and as ``NaN`` or ``Infinity`` by :py:mod:`json`).
+``NaN`` and ``Infinity`` are still decoded by both backends.
+"""
+# pylint: disable=invalid-name
+import json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def default(obj):
+    """Serialize objects not supported by JSON backends."""
+    return str(obj)
+
+
+if orjson is not None:
+    backend = 'orjson'
+    _OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def loads(data):
+        """Deserialize JSON from `str` or `bytes`."""
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # Standard library decodes 'NaN' and 'Infinity'
+            return json.loads(data)
+
+    def dumpb(obj):
+        """Serialize to JSON `bytes`."""
+        return orjson.dumps(obj, default=default, option=_OPTIONS)
+
+    def dumps(obj):
+        """Serialize to JSON `str`."""
+        return dumpb(obj).decode('utf-8')
+else:
+    backend = 'json'
+    _encoder = json.JSONEncoder(
+        default=default,
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+
+    def loads(data):
+        """Deserialize JSON from `str` or `bytes`."""
+        return json.loads(data)
+
+    def dumps(obj):
+        """Serialize to JSON `str`."""
+        return _encoder.encode(obj)
+
+    def dumpb(obj):
+        """Serialize to JSON `bytes`."""
+        return dumps(obj).encode('utf-8')
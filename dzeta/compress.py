@@ -0,0 +1,69 @@
+"""Text compression.
+
+Compressed data is self-describing, as the codec is detected from
+the magic number of the frame, so data compressed with different codecs
+can be mixed. *zstd* requires :py:mod:`zstandard` package
+and :py:mod:`zlib` is used if it is not installed.
+"""
+import zlib
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+#: Magic number of *zstd* frames.
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+#: Default compression method.
+DEFAULT_METHOD = 'zlib' if zstandard is None else 'zstd'
+
+
+def compress(text, method=None, level=None):
+    """Compress text.
+
+    Parameters
+    ----------
+    text : str
+        Text to compress. It is encoded as UTF-8.
+    method : {'zstd', 'zlib'}, optional
+        Compression method. Defaults to :py:data:`DEFAULT_METHOD`.
+    level : int, optional
+        Compression level. Codec default is used if ``None``.
+
+    Returns
+    -------
+    bytes
+        Compressed data.
+    """
+    method = method or DEFAULT_METHOD
+    data = text.encode('utf-8')
+    if method == 'zstd':
+        if zstandard is None:
+            raise ImportError("'zstd' compression requires 'zstandard' package")
+        kwds = {} if level is None else { 'level': level }
+        return zstandard.ZstdCompressor(**kwds).compress(data)
+    if method == 'zlib':
+        return zlib.compress(data, -1 if level is None else level)
+    raise ValueError(f"Unknown compression method '{method}'")
+
+
+def decompress(data):
+    """Decompress text compressed with :py:func:`compress`.
+
+    Parameters
+    ----------
+    data : bytes
+        Compressed data.
+
+    Returns
+    -------
+    str
+        Decompressed text.
+    """
+    data = bytes(data)
+    if data[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ImportError("'zstd' decompression requires 'zstandard' package")
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = zlib.decompress(data)
+    return data.decode('utf-8')
@@ -1,8 +1,8 @@
 """Database booster."""
-import json
 from datetime import date, datetime
+from .. import codec
 from ..meta import Interface
-from ..schema import Schema, fields
+from ..schema import Schema, Loader, fields
 
 
 class DBModelInterface(Interface):
@@ -37,11 +37,26 @@ class DBModelInterface(Interface):
     def model(self):
         return self._
 
+    @property
+    def model_class(self):
+        model = self.model
+        return model if isinstance(model, type) else type(model)
+
     @property
     def schema(self):
-        return self.model.__schema__
+        model = self.model_class
+        if '__schema__' not in model.__dict__:
+            self.set_schema(model)
+        return model.__schema__
 
-    def from_dict(self, dct, only_dict=False, **kwds):
+    @property
+    def loader(self):
+        model = self.model_class
+        if '__loader__' not in model.__dict__:
+            self.set_schema(model)
+        return model.__loader__
+
+    def from_dict(self, dct, only_dict=False, trusted=False, **kwds):
         """Instantiate record from dict.
 
         Parameters
@@ -50,14 +65,36 @@ class DBModelInterface(Interface):
             Data dictionary.
         only_dict : bool
             Should only normalized `dict` be returned.
+        trusted : bool
+            Should validation of required and non-nullable fields be skipped.
+            Use only for data that is known to be valid.
         **kwds :
-            Passed to :py:meth:`marshmallow.Schema.load`.
+            Passed to :py:class:`dzeta.schema.Loader`.
         """
-        dct = self.schema.load(dct, **kwds)
+        dct = self.loader(dct, trusted=trusted, **kwds)
         if only_dict:
             return dct
         return self.model(**dct)
 
+    def from_dicts(self, dcts, only_dict=False, trusted=False, **kwds):
+        """Instantiate records from dicts lazily.
+
+        Parameters
+        ----------
+        dcts : iterable of dict
+            Data dictionaries.
+        only_dict : bool
+            Should only normalized `dict` objects be returned.
+        trusted : bool
+            Should validation of required and non-nullable fields be skipped.
+        **kwds :
+            Passed to :py:meth:`dzeta.schema.Loader.load_many`.
+        """
+        dcts = self.loader.load_many(dcts, trusted=trusted, **kwds)
+        if only_dict:
+            return dcts
+        return (self.model(**dct) for dct in dcts)
+
     def to_dict(self):
         """Dump record to a dict.
 
@@ -73,12 +110,12 @@ class DBModelInterface(Interface):
 
         Parameters
         ----------
-        string : str
+        string : str or bytes
             Valid JSON string.
         **kwds :
             Passed to :py:meth:`from_dict`.
         """
-        dct = json.loads(string)
+        dct = codec.loads(string)
         return self.from_dict(dct, **kwds)
 
     def to_json(self):
@@ -106,9 +143,15 @@ class DBModelInterface(Interface):
 
     @classmethod
     def set_schema(cls, model):
-        """Set schema on model."""
+        """Set schema on model.
+
+        It is called on first access to :py:attr:`schema`
+        or :py:attr:`loader`, so schemas are built only for models
+        which are actually loaded from dicts.
+        """
         schema = { k: v for k, v in cls.get_schema(model).items() if v }
         model.__schema__ = Schema.from_dict(schema)()
+        model.__loader__ = Loader(model.__schema__)
 
     @classmethod
     def get_field_meta(cls, field):
@@ -124,13 +167,3 @@ class DBModelInterface(Interface):
         meta = cls.get_field_meta(field)
         schemacls = cls.__schema_map__.get(field.__class__, fields.Raw)
         return schemacls(**meta)
-
-    @classmethod
-    def inject(cls, instance, init=True, **kwds):
-        """Inject reference to the interface instance in the original instance.
-
-        See :py:meth:`dzeta.meta.Interface.inject` for more details.
-        """
-        instance = super().inject(instance, init=init, **kwds)
-        cls.set_schema(instance)
-        return instance
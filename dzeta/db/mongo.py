@@ -1,15 +1,345 @@
 """MongoDB booster."""
 # pylint: disable=no-member,arguments-differ,protected-access
 # pylint: disable=redefined-outer-name
-from more_itertools import chunked
-from pymongo import UpdateOne
-from mongoengine import BooleanField, DateTimeField
+import time
+import logging
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import bson
+from pymongo import UpdateOne, IndexModel
+from pymongo.errors import PyMongoError
+from mongoengine import Document, BooleanField, DateTimeField
 from mongoengine import IntField, FloatField
 from mongoengine import EmbeddedDocumentField, EmbeddedDocumentListField
+from mongoengine.base import _document_registry
+from mongoengine.connection import _connection_settings
+from mongoengine.document import includes_cls
 from . import DBModelInterface
+from .. import codec
 from ..schema import fields
 
 
+logger = logging.getLogger(__name__)
+#: Logger of the slow-query log.
+#: Entries are logged as JSON objects with ``WARNING`` level.
+slow_logger = logging.getLogger(__name__+'.slow')
+
+
+#: Hard limit on the BSON size of ops in one bulk write batch.
+MAX_BATCH_BYTES = 32*1024*1024
+
+#: Index options compared between declared and existing indexes.
+INDEX_OPTIONS = (
+    'unique',
+    'sparse',
+    'partialFilterExpression',
+    'expireAfterSeconds',
+    'collation'
+)
+
+
+class Batcher:
+    """Split write ops into batches by count and encoded BSON size.
+
+    Attributes
+    ----------
+    n : int
+        Maximum number of ops in a batch.
+        No limit (other than size) if falsy or non-positive.
+    max_bytes : int
+        Maximum BSON size of a batch. It is capped at :py:data:`MAX_BATCH_BYTES`.
+        A single op larger than that is written in a batch of its own.
+    latency : float, optional
+        Target write time of one batch in seconds.
+        If set, then `n` is doubled after batches written faster than
+        half of the target and halved after batches slower than the target.
+    min_n : int
+        Minimum batch size when adapting.
+    max_n : int
+        Maximum batch size when adapting.
+    """
+    def __init__(self, n=0, max_bytes=MAX_BATCH_BYTES, latency=None,
+                 min_n=10, max_n=100000):
+        if latency and (not n or n <= 0):
+            n = 1000
+        self.n = n if n and n > 0 else None
+        self.max_bytes = min(max_bytes or MAX_BATCH_BYTES, MAX_BATCH_BYTES)
+        self.latency = latency
+        self.min_n = min_n
+        self.max_n = max_n
+
+    def batches(self, ops):
+        """Iterate over batches (lists) of ops."""
+        batch = []
+        size = 0
+        for op in ops:
+            op_size = self.get_size(op)
+            if batch and (self.n and len(batch) >= self.n
+                          or size + op_size > self.max_bytes):
+                yield batch
+                batch = []
+                size = 0
+            batch.append(op)
+            size += op_size
+        if batch:
+            yield batch
+
+    def update(self, elapsed):
+        """Adapt batch size to write time of the last batch."""
+        if not self.latency:
+            return
+        if elapsed > self.latency:
+            self.n = max(self.min_n, self.n // 2)
+        elif elapsed < self.latency / 2:
+            self.n = min(self.max_n, self.n * 2)
+
+    @staticmethod
+    def get_size(op):
+        """Get BSON size of a write op."""
+        doc = {}
+        for attr in ('_filter', '_doc'):
+            value = getattr(op, attr, None)
+            if value is not None:
+                doc[attr] = value
+        return len(bson.encode(doc))
+
+
+def coalesce_updates(ops):
+    """Merge update ops with the same filter.
+
+    :py:class:`pymongo.operations.UpdateOne` ops with the same filter
+    and upsert flag using only ``$set`` and ``$unset`` operators
+    are merged into one op (at the position of the first one)
+    with last-writer-wins semantics. Ops with other operators
+    or options and ops setting overlapping paths (i.e. ``a`` and ``a.b``)
+    are not merged across, so the final state of every document is the same
+    as after applying the original ops in order. Other ops
+    (i.e. :py:class:`pymongo.operations.UpdateMany`) stop all merging
+    as they may target any documents. Ops with different filters are assumed
+    to target different documents (as is the case for primary key filters).
+
+    Parameters
+    ----------
+    ops : iterable of write ops
+        Write ops.
+
+    Returns
+    -------
+    list
+        Write ops.
+    """
+    out = []
+    groups = {}
+    for op in ops:
+        if not isinstance(op, UpdateOne):
+            groups.clear()
+            out.append(op)
+            continue
+        try:
+            key = bson.encode(op._filter)
+        except (TypeError, bson.errors.InvalidDocument):
+            groups.clear()
+            out.append(op)
+            continue
+        update = _get_coalescable(op)
+        if update is None:
+            groups.pop(key, None)
+            out.append(op)
+            continue
+        group = groups.get(key)
+        if group is None or not group.merge(op, update):
+            group = _Coalesced(op, update)
+            groups[key] = group
+            out.append(group)
+    return [ x.get_op() if isinstance(x, _Coalesced) else x for x in out ]
+
+
+def _get_coalescable(op):
+    update = op._doc
+    if not isinstance(update, dict) or not update \
+    or not set(update).issubset(('$set', '$unset')):
+        return None
+    for attr in ('_collation', '_array_filters', '_hint', '_sort'):
+        if getattr(op, attr, None) is not None:
+            return None
+    return update
+
+
+class _Coalesced:
+    """Group of coalesced update ops."""
+    def __init__(self, op, update):
+        self.op = op
+        self.count = 1
+        self.set = dict(update.get('$set', {}))
+        self.unset = dict(update.get('$unset', {}))
+
+    def merge(self, op, update):
+        """Merge op or return ``False`` if it can not be merged."""
+        if op._upsert != self.op._upsert:
+            return False
+        keys = [ *update.get('$set', ()), *update.get('$unset', ()) ]
+        current = [ *self.set, *self.unset ]
+        for key in keys:
+            for other in current:
+                if key != other and (key.startswith(other+'.')
+                                     or other.startswith(key+'.')):
+                    return False
+        # Setting nested fields creates parent documents
+        # which are not removed by unsetting
+        for key in update.get('$unset', ()):
+            if '.' in key and key in self.set:
+                return False
+        for key, value in update.get('$set', {}).items():
+            self.unset.pop(key, None)
+            self.set[key] = value
+        for key, value in update.get('$unset', {}).items():
+            self.set.pop(key, None)
+            self.unset[key] = value
+        self.count += 1
+        return True
+
+    def get_op(self):
+        """Get merged op."""
+        if self.count == 1:
+            return self.op
+        update = {}
+        if self.set:
+            update['$set'] = self.set
+        if self.unset:
+            update['$unset'] = self.unset
+        return UpdateOne(self.op._filter, update, upsert=self.op._upsert)
+
+
+def _index_option(spec, key):
+    value = spec.get(key)
+    if key in ('unique', 'sparse'):
+        return bool(value)
+    return value
+
+
+def summarize_explain(explain):
+    """Summarize output of an ``explain`` command.
+
+    Both ``find`` and ``aggregate`` explains (also from sharded clusters)
+    are supported, as the whole output is searched for plan stages
+    and execution statistics.
+
+    Parameters
+    ----------
+    explain : dict
+        Output of an ``explain`` command.
+
+    Returns
+    -------
+    dict
+        Flags of collection scans and in-memory (blocking) sorts,
+        names of used indexes and totals of examined keys and documents
+        (only with ``executionStats`` or higher verbosity).
+    """
+    summary = {
+        'collscan': False,
+        'inMemorySort': False,
+        'indexes': []
+    }
+    totals = {
+        'totalKeysExamined': 'keysExamined',
+        'totalDocsExamined': 'docsExamined'
+    }
+
+    def walk(obj, after_cursor=False):
+        if isinstance(obj, list):
+            cursor = False
+            for x in obj:
+                walk(x, after_cursor=cursor)
+                cursor = cursor or isinstance(x, dict) and '$cursor' in x
+            return
+        if not isinstance(obj, dict):
+            return
+        stage = obj.get('stage')
+        if stage == 'COLLSCAN':
+            summary['collscan'] = True
+        elif stage == 'SORT' or after_cursor and '$sort' in obj:
+            summary['inMemorySort'] = True
+        index = obj.get('indexName')
+        if stage == 'IXSCAN' and index and index not in summary['indexes']:
+            summary['indexes'].append(index)
+        # Lookups report scans of foreign collections separately
+        if obj.get('collectionScans'):
+            summary['collscan'] = True
+        for key, value in obj.items():
+            if key in totals and isinstance(value, int):
+                summary[totals[key]] = summary.get(totals[key], 0) + value
+            elif key not in ('rejectedPlans', 'allPlansExecution'):
+                walk(value)
+
+    walk(explain)
+    return summary
+
+
+class TimedCursor:
+    """Cursor wrapper measuring time spent on fetching documents.
+
+    Time spent by consumers on processing documents is not counted.
+    The callback is called once when the cursor is exhausted or closed.
+    Other attributes are delegated to the wrapped cursor.
+
+    Attributes
+    ----------
+    cursor : pymongo.cursor.Cursor or pymongo.command_cursor.CommandCursor
+        Wrapped cursor.
+    callback : callable
+        Called with the cursor object when it is finished.
+    elapsed : float
+        Seconds spent on executing the query and fetching documents.
+    count : int
+        Number of fetched documents.
+    """
+    def __init__(self, cursor, callback, elapsed=0):
+        self.cursor = cursor
+        self.callback = callback
+        self.elapsed = elapsed
+        self.count = 0
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        start = time.monotonic()
+        try:
+            doc = next(self.cursor)
+        except StopIteration:
+            self.elapsed += time.monotonic() - start
+            self.finish()
+            raise
+        self.elapsed += time.monotonic() - start
+        self.count += 1
+        return doc
+
+    next = __next__
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def finish(self):
+        """Call the callback if it was not called yet."""
+        if not self.finished:
+            self.finished = True
+            self.callback(self)
+
+    def close(self):
+        """Close the cursor."""
+        self.finish()
+        self.cursor.close()
+
+
 class MongoModelInterface(DBModelInterface):
     """MongoDB model interface class.
 
@@ -31,6 +361,15 @@ class MongoModelInterface(DBModelInterface):
         IntField: fields.Integer,
         FloatField: fields.Float
     }
+    #: Queries (see :py:meth:`aggregate` and :py:meth:`find`) running
+    #: longer (in milliseconds) are logged in the slow-query log.
+    #: Slow queries are not logged if ``None``.
+    slow_ms = None
+    #: Verbosity of explains of slow queries. ``queryPlanner`` only plans
+    #: queries, but it shows collection scans and in-memory sorts.
+    #: ``executionStats`` shows also numbers of examined documents,
+    #: but it runs queries once more. Slow queries are not explained if ``None``.
+    explain_verbosity = 'queryPlanner'
 
     @property
     def pk_field(self):
@@ -87,7 +426,148 @@ class MongoModelInterface(DBModelInterface):
             **kwds
         )
 
-    def bulk_write(self, ops, n=0, **kwds):
+    def get_queryset(self, alias=None):
+        """Get model queryset.
+
+        Parameters
+        ----------
+        alias : str, optional
+            Connection alias. Default connection is used if ``None``
+            or if there is no connection registered with `alias`.
+        """
+        qs = self.model.objects
+        if alias is not None and alias not in _connection_settings:
+            logger.debug("Connection '%s' is not registered, using default", alias)
+            alias = None
+        if alias is not None:
+            qs = qs.using(alias)
+        return qs
+
+    def aggregate(self, *pipeline, alias=None, **kwds):
+        """Run timed aggregation pipeline.
+
+        Documents are filtered by model class first,
+        as in :py:meth:`mongoengine.queryset.QuerySet.aggregate`.
+
+        Parameters
+        ----------
+        *pipeline : dict
+            Pipeline stages.
+        alias : str, optional
+            Connection alias. Default connection is used if ``None``.
+        **kwds :
+            Passed to :py:meth:`pymongo.collection.Collection.aggregate`,
+            i.e. ``allowDiskUse``.
+
+        Returns
+        -------
+        TimedCursor
+            Cursor wrapper. The query is logged when it is exhausted or closed.
+        """
+        qs = self.get_queryset(alias)
+        pipeline = list(pipeline)
+        if qs._query:
+            pipeline.insert(0, { '$match': qs._query })
+        collection = qs._collection
+        command = {
+            'aggregate': collection.name,
+            'pipeline': pipeline,
+            'cursor': {},
+            **kwds
+        }
+        start = time.monotonic()
+        cursor = collection.aggregate(pipeline, **kwds)
+        return TimedCursor(
+            cursor,
+            callback=lambda c: self.log_query(collection, command, c),
+            elapsed=time.monotonic() - start
+        )
+
+    def find(self, query=None, projection=None, alias=None, **kwds):
+        """Run timed find query.
+
+        Documents are filtered by model class
+        as in :py:class:`mongoengine.queryset.QuerySet`.
+
+        Parameters
+        ----------
+        query : dict, optional
+            Raw query.
+        projection : dict, optional
+            Projection.
+        alias : str, optional
+            Connection alias. Default connection is used if ``None``.
+        **kwds :
+            Passed to :py:meth:`pymongo.collection.Collection.find`.
+            Only ``sort``, ``limit`` and ``skip`` are passed
+            to ``explain`` of slow queries.
+
+        Returns
+        -------
+        TimedCursor
+            Cursor wrapper. The query is logged when it is exhausted or closed.
+        """
+        qs = self.get_queryset(alias)
+        query = query or {}
+        if qs._query:
+            query = { '$and': [ qs._query, query ] } if query else qs._query
+        collection = qs._collection
+        command = { 'find': collection.name, 'filter': query }
+        if projection is not None:
+            command['projection'] = projection
+        if kwds.get('sort'):
+            command['sort'] = dict(kwds['sort'])
+        for key in ('limit', 'skip'):
+            if kwds.get(key):
+                command[key] = kwds[key]
+        start = time.monotonic()
+        cursor = collection.find(query, projection, **kwds)
+        return TimedCursor(
+            cursor,
+            callback=lambda c: self.log_query(collection, command, c),
+            elapsed=time.monotonic() - start
+        )
+
+    def log_query(self, collection, command, cursor):
+        """Log query timing and explain slow queries.
+
+        Parameters
+        ----------
+        collection : pymongo.collection.Collection
+            Queried collection.
+        command : dict
+            Query command.
+        cursor : TimedCursor
+            Finished cursor.
+        """
+        ms = cursor.elapsed * 1000
+        kind = next(iter(command))
+        logger.debug("%s %s: %d docs in %.1f ms",
+                     kind, collection.name, cursor.count, ms)
+        if self.slow_ms is None or ms < self.slow_ms:
+            return
+        entry = {
+            'timestamp': datetime.utcnow(),
+            'collection': collection.name,
+            'model': self.model.__name__,
+            'ms': round(ms, 1),
+            'nReturned': cursor.count,
+            'command': command
+        }
+        if self.explain_verbosity:
+            try:
+                # Explain on the same members as the query, i.e. secondaries
+                explain = collection.database.command(
+                    { 'explain': command, 'verbosity': self.explain_verbosity },
+                    read_preference=collection.read_preference
+                )
+                entry.update(summarize_explain(explain))
+            except PyMongoError as exc:
+                entry['explainError'] = str(exc)
+        slow_logger.warning(codec.dumps(entry))
+
+    def bulk_write(self, ops, n=0, inflight=0, max_bytes=MAX_BATCH_BYTES,
+                   latency=None, on_batch=None, coalesce=False, **kwds):
         """Execute bulk write operations.
 
         Parameters
@@ -95,19 +575,219 @@ class MongoModelInterface(DBModelInterface):
         ops : iterable of write ops
             Write ops such as :py:class:`pymongo.operations.UpdateOne`.
         n : int
-            Chunke size. If falsy or non-positive then all ops are executed
-            in one batch.
+            Chunke size. If falsy or non-positive then ops are batched
+            only by their encoded size.
+        inflight : int
+            Number of batches written concurrently in a thread pool,
+            so construction of next batches overlaps with writing.
+            At most `inflight` batches are pending at any time
+            and consuming of `ops` is paused until the oldest one is written.
+            Batches are written with ``ordered=False`` unless
+            specified otherwise. Batches are written one by one
+            if falsy or non-positive.
+        max_bytes : int
+            Maximum BSON size of ops in one batch.
+            It is capped at :py:data:`MAX_BATCH_BYTES`, so batches never
+            grow without bounds, whatever the value of `n`.
+        latency : float, optional
+            Target write time of one batch in seconds.
+            If set, then chunk size is adapted to observed write times.
+        on_batch : callable, optional
+            Function called with a batch (list of ops) and its bulk API
+            result after the batch is acknowledged. Batches are always
+            reported in order, also when written concurrently,
+            so it can be used for recording progress.
+            Original (not coalesced) batches are passed.
+        coalesce : bool
+            Should update ops with the same filter be merged
+            within batches (see :py:func:`coalesce_updates`).
+            Number of saved ops is reported as ``nCoalesced``
+            in batch results.
         **kwds :
             Passed to :py:meth:`pymongo.collection.Collection.bulk_write`.
+
+        Yields
+        ------
+        dict
+            Bulk API results of consecutive batches.
         """
-        if n and n > 0:
-            ops = chunked(ops, n)
-        else:
-            ops = [ ops ]
+        batcher = Batcher(n=n, max_bytes=max_bytes, latency=latency)
         collection = self.get_collection()
-        for batch in ops:
-            res = collection.bulk_write(list(batch), **kwds)
-            yield res.bulk_api_result
+        if inflight and inflight > 0:
+            kwds = { 'ordered': False, **kwds }
+
+        def write(batch):
+            start = time.monotonic()
+            ops = coalesce_updates(batch) if coalesce else batch
+            res = collection.bulk_write(ops, **kwds)
+            batcher.update(time.monotonic() - start)
+            info = res.bulk_api_result
+            if coalesce:
+                info['nCoalesced'] = len(batch) - len(ops)
+            return info
+
+        def done(batch, info):
+            if on_batch is not None:
+                on_batch(batch, info)
+            return info
+
+        if not inflight or inflight <= 0:
+            for batch in batcher.batches(ops):
+                yield done(batch, write(batch))
+            return
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=inflight) as executor:
+            for batch in batcher.batches(ops):
+                if len(pending) >= inflight:
+                    batch_, future = pending.popleft()
+                    yield done(batch_, future.result())
+                pending.append((batch, executor.submit(write, batch)))
+            while pending:
+                batch_, future = pending.popleft()
+                yield done(batch_, future.result())
+
+    def get_index_models(self):
+        """Get declared indexes of the model collection.
+
+        Indexes declared in ``meta`` of all models stored in the collection
+        (i.e. base classes and subclasses) are included as well as the implicit ``_cls``
+        index (see :py:meth:`mongoengine.Document.ensure_indexes`).
+
+        Returns
+        -------
+        dict
+            Mapping from index names to :py:class:`pymongo.IndexModel` objects.
+        """
+        collection_name = self.model._get_collection_name()
+        models = [
+            model for model in _document_registry.values()
+            if not model._meta.get('abstract') and issubclass(model, Document)
+            and model._get_collection_name() == collection_name
+        ]
+        indexes = {}
+        for model in models:
+            meta = model._meta
+            cls_indexed = False
+            for spec in meta['index_specs']:
+                spec = { **(meta.get('index_opts') or {}), **spec }
+                spec.pop('cls', None)
+                fields = spec.pop('fields')
+                cls_indexed = cls_indexed or includes_cls(fields)
+                index = IndexModel(fields, **spec)
+                indexes.setdefault(index.document['name'], index)
+            if meta.get('index_cls', True) and not cls_indexed \
+            and meta.get('allow_inheritance'):
+                index = IndexModel([ ('_cls', 1) ])
+                indexes.setdefault(index.document['name'], index)
+        return indexes
+
+    def diff_indexes(self):
+        """Diff declared indexes against indexes existing on the server.
+
+        Indexes are matched by names, which are derived from keys,
+        and compared by keys and :py:data:`INDEX_OPTIONS`.
+
+        Returns
+        -------
+        dict
+            ``missing`` declared indexes (:py:class:`pymongo.IndexModel`),
+            ``changed`` indexes existing with different keys or options
+            and ``extra`` indexes which are not declared
+            (names; the ``_id`` index is never reported).
+        """
+        declared = self.get_index_models()
+        existing = self.get_collection().index_information()
+        diff = { 'missing': [], 'changed': [], 'extra': [] }
+        for name, index in declared.items():
+            info = existing.get(name)
+            if info is None:
+                diff['missing'].append(index)
+                continue
+            spec = index.document
+            keys = [ tuple(x) for x in spec['key'].items() ]
+            if keys != [ tuple(x) for x in info['key'] ] or any(
+                _index_option(spec, k) != _index_option(info, k)
+                for k in INDEX_OPTIONS
+            ):
+                diff['changed'].append(name)
+        diff['extra'] = [
+            name for name in existing
+            if name != '_id_' and name not in declared
+        ]
+        return diff
+
+    def get_index_stats(self):
+        """Get index usage statistics from ``$indexStats``.
+
+        Returns
+        -------
+        dict
+            Mapping from index names to numbers of operations
+            using them (summed over all hosts) and times
+            since which they are counted. Counters are reset
+            when servers restart or indexes are rebuilt.
+        """
+        stats = {}
+        for doc in self.get_collection().aggregate([ { '$indexStats': {} } ]):
+            accesses = doc.get('accesses', {})
+            stat = stats.setdefault(doc['name'], { 'ops': 0, 'since': None })
+            stat['ops'] += accesses.get('ops', 0)
+            since = accesses.get('since')
+            if since is not None and (stat['since'] is None
+                                      or since < stat['since']):
+                stat['since'] = since
+        return stats
+
+    def sync_indexes(self, drop=False, stats=True):
+        """Create missing indexes and report unused and undeclared ones.
+
+        Missing indexes are built together in one ``createIndexes``
+        command, so the collection is scanned only once.
+        Builds do not lock the collection (they are run
+        in the background on older servers).
+
+        Parameters
+        ----------
+        drop : bool
+            Should undeclared indexes be dropped.
+            Changed indexes are never dropped, as it has to be decided
+            whether to rebuild them.
+        stats : bool
+            Should unused indexes be reported (see :py:meth:`get_index_stats`).
+
+        Returns
+        -------
+        dict
+            Names of ``created``, ``changed``, ``extra``, ``dropped``
+            and ``unused`` indexes.
+        """
+        collection = self.get_collection()
+        diff = self.diff_indexes()
+        info = {
+            'collection': collection.name,
+            'created': [],
+            'changed': diff['changed'],
+            'extra': diff['extra'],
+            'dropped': []
+        }
+        if diff['missing']:
+            indexes = []
+            for index in diff['missing']:
+                spec = dict(index.document)
+                keys = list(spec.pop('key').items())
+                indexes.append(IndexModel(keys, background=True, **spec))
+            info['created'] = collection.create_indexes(indexes)
+        if drop:
+            for name in diff['extra']:
+                collection.drop_index(name)
+                info['dropped'].append(name)
+        if stats:
+            info['unused'] = [
+                name for name, stat in self.get_index_stats().items()
+                if name != '_id_' and name not in info['dropped']
+                and not stat['ops']
+            ]
+        return info
 
     @classmethod
     def get_field_meta(cls, field):
@@ -1,5 +1,5 @@
 """Metaprogramming utilities (decorators, metaclasses etc.)."""
-from functools import update_wrapper
+from types import MethodType
 
 
 def composable(cls):
@@ -17,6 +17,10 @@ def composable(cls):
     It will be consisdered an empty dict if it does not exist on a given
     instance.
 
+    Bound methods found on components are cached on the parent instance,
+    so they are resolved only once. Other attributes are always
+    looked up again, since their values may change.
+
     Parameters
     ----------
     cls : type
@@ -31,18 +35,21 @@ def composable(cls):
     errmsg = f"'{cls.__name__}' "+"object has no attribute '{0}'"
     cls_getattr = getattr(cls, '__getattr__', None)
     def __getattr__(self, attr):
+        if attr == '__components__':
+            raise AttributeError(errmsg.format(attr))
         if cls_getattr is not None:
             try:
-                return cls_getattr(attr)
+                return cls_getattr(self, attr)
             except AttributeError:
                 pass
-        if '__components__' in dir(self):
-            components = self.__components__
-        else:
-            components = {}
-        for component in components.values():
-            if hasattr(component, attr):
-                return getattr(component, attr)
+        for component in getattr(self, '__components__', {}).values():
+            try:
+                value = getattr(component, attr)
+            except AttributeError:
+                continue
+            if isinstance(value, MethodType):
+                self.__dict__[attr] = value
+            return value
         raise AttributeError(errmsg.format(attr))
     cls.__getattr__ = __getattr__
     return cls
@@ -93,18 +100,44 @@ class Interface:
         instance : object
             An object to be injected.
         init : bool
-            If `instance` is a `type`, should `__init__` be decorated so
-            instances are also injected with the interface?
+            If `instance` is a `type`, should its instances be also
+            injected with the interface? Instance interfaces are created
+            lazily with :py:class:`InterfaceDescriptor`.
         **kwds :
             Passed to :py:meth:`__init__` method.
         """
         interfaced = cls(instance=instance, **kwds)
-        instance._ = interfaced
         if init and isinstance(instance, type):
-            cls_init = instance.__init__
-            def __init__(self, *args, **kwds):
-                cls_init(self, *args, **kwds)
-                interfaced = cls(self)
-                self._ = interfaced
-            instance.__init__ = update_wrapper(__init__, cls_init)
+            instance._ = InterfaceDescriptor(cls, interfaced)
+        else:
+            instance._ = interfaced
         return instance
+
+
+class InterfaceDescriptor:
+    """Descriptor providing interfaces of a class and its instances.
+
+    Interfaces of instances are created lazily on first access
+    and cached in the instance dict, so creating instances
+    (i.e. hydrating database records) costs nothing extra.
+
+    Attributes
+    ----------
+    interface : type
+        Interface class.
+    interfaced : Interface
+        Interface of the class itself.
+    """
+    def __init__(self, interface, interfaced):
+        self.interface = interface
+        self.interfaced = interfaced
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self.interfaced
+        interfaced = self.interface(obj)
+        try:
+            obj.__dict__['_'] = interfaced
+        except AttributeError:
+            pass
+        return interfaced
@@ -1,7 +1,11 @@
 """_Dzeta_ custom data types."""
 # pylint: disable=multiple-statements,useless-super-delegation
 # pylint: disable=arguments-differ,unused-import
+from math import isfinite
+from numbers import Integral
 from marshmallow import Schema as _Schema, fields, INCLUDE
+from marshmallow import ValidationError, missing
+from marshmallow.utils import from_iso_datetime
 
 
 class SchemaDict(dict):
@@ -30,3 +34,166 @@ class Schema(_Schema):
         changes returned object to :py:class:`SchemaDict`.
         """
         return SchemaDict(super().dump(obj, *args, **kwds))
+
+
+class Loader:
+    """Compiled loader of a :py:class:`marshmallow.Schema`.
+
+    It does the same aliasing (``data_key`` and ``attribute``), defaults
+    and type coercion of the most common field types as
+    :py:meth:`Schema.load`, but in a single specialised loop
+    without per-field dispatch of *marshmallow*. Fields of other types,
+    fields with validators and schemas with processing hooks are loaded
+    with the original schema. Whenever a record does not pass fast checks
+    it is loaded again with :py:meth:`Schema.load`, so errors
+    are reported in exactly the same way.
+
+    Attributes
+    ----------
+    schema : Schema
+        Schema instance.
+    specs : list of tuple
+        Compiled field specifications.
+    """
+    def __init__(self, schema):
+        self.schema = schema
+        self.specs = []
+        self.keys = set()
+        self.include = schema.unknown == INCLUDE
+        self.compiled = not any(getattr(schema, '_hooks', {}).values())
+        for name, field in schema.load_fields.items():
+            key = field.data_key if field.data_key is not None else name
+            self.keys.add(key)
+            self.specs.append((
+                key,
+                field.attribute or name,
+                self.get_coercer(field),
+                field.required,
+                field.allow_none,
+                field.missing
+            ))
+
+    def __call__(self, dct, partial=False, trusted=False, **kwds):
+        """Load a record.
+
+        Parameters
+        ----------
+        dct : dict
+            Data dictionary.
+        partial : bool
+            Should missing fields be ignored.
+        trusted : bool
+            Should checks of required and non-nullable fields be skipped.
+            This is meant for bulk imports of data that was
+            already validated.
+        **kwds :
+            Passed to :py:meth:`Schema.load`.
+            The compiled loader is not used if any are provided.
+        """
+        if kwds or not self.compiled or not isinstance(partial, bool):
+            return self.schema.load(dct, partial=partial, **kwds)
+        try:
+            return self._load(dct, partial, trusted)
+        except (TypeError, ValueError, ValidationError):
+            return self.schema.load(dct, partial=partial)
+
+    def load_many(self, dcts, **kwds):
+        """Load records lazily.
+
+        Parameters
+        ----------
+        dcts : iterable of dict
+            Data dictionaries.
+        **kwds :
+            Passed to :py:meth:`__call__`.
+        """
+        load = self.__call__
+        for dct in dcts:
+            yield load(dct, **kwds)
+
+    def _load(self, dct, partial, trusted):
+        out = SchemaDict()
+        get = dct.get
+        for key, attr, coerce, required, allow_none, default in self.specs:
+            value = get(key, missing)
+            if value is missing:
+                if partial:
+                    continue
+                if required and not trusted:
+                    raise ValueError
+                value = default() if callable(default) else default
+                if value is not missing:
+                    out[attr] = value
+            elif value is None:
+                if not allow_none and not trusted:
+                    raise ValueError
+                out[attr] = None
+            elif coerce is None:
+                out[attr] = value
+            else:
+                out[attr] = coerce(value)
+        if self.include:
+            keys = self.keys
+            for key, value in dct.items():
+                if key not in keys:
+                    out[key] = value
+        return out
+
+    @staticmethod
+    def get_coercer(field):
+        """Get fast coercion function for a field.
+
+        Returns ``None`` if values are passed as they are.
+        Coercion functions raise :py:class:`ValueError`
+        or :py:class:`TypeError` for invalid values.
+        """
+        cls = field.__class__
+        if field.validators:
+            return field.deserialize
+        if cls is fields.Raw:
+            return None
+        if cls is fields.Integer:
+            return _integer_strict if field.strict else _integer
+        if cls is fields.Float:
+            return _float if field.allow_nan else _float_finite
+        if cls is fields.Boolean:
+            truthy, falsy = field.truthy, field.falsy
+            if not truthy:
+                return bool
+            def _boolean(value):
+                if value in truthy:
+                    return True
+                if value in falsy:
+                    return False
+                raise ValueError(value)
+            return _boolean
+        if cls is fields.DateTime and field.format in (None, 'iso', 'iso8601'):
+            return _datetime
+        return field.deserialize
+
+
+def _integer(value):
+    if value is True or value is False:
+        raise TypeError(value)
+    return value if type(value) is int else int(value)
+
+def _integer_strict(value):
+    if not isinstance(value, Integral) or value is True or value is False:
+        raise TypeError(value)
+    return int(value)
+
+def _float(value):
+    if value is True or value is False:
+        raise TypeError(value)
+    return float(value)
+
+def _float_finite(value):
+    value = _float(value)
+    if not isfinite(value):
+        raise ValueError(value)
+    return value
+
+def _datetime(value):
+    if not value or not isinstance(value, str):
+        raise TypeError(value)
+    return from_iso_datetime(value)
@@ -1,7 +1,13 @@
 """Dzeta utility functions."""
+import os
+import bz2
+import gzip
+import mmap
 from datetime import datetime, date
 from importlib import import_module
-import dateparser
+
+#: File extensions of compressed files supported by :py:func:`open_file`.
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zst', '.zstd')
 
 
 def parse_date(dt, preprocessor=None, date_formats=None, **kwds):
@@ -25,6 +31,8 @@ def parse_date(dt, preprocessor=None, date_formats=None, **kwds):
         return datetime(*dt.timetuple()[:6])
     if preprocessor:
         dt = preprocessor(dt, **kwds)
+    # Imported lazily as it is slow to import
+    import dateparser # pylint: disable=import-outside-toplevel
     return dateparser.parse(dt, date_formats=date_formats)
 
 
@@ -92,3 +100,84 @@ def import_python(path, package=None):
     if obj:
         return getattr(module, obj)
     return module
+
+
+def open_file(path, mode='rb'):
+    """Open file decompressing it on the fly if needed.
+
+    Compression is detected from file extension
+    (see :py:data:`COMPRESSED_EXTENSIONS`). *zstd* files
+    require :py:mod:`zstandard` package.
+
+    Parameters
+    ----------
+    path : str
+        Path to a file.
+    mode : str
+        Read mode (``'rb'`` or ``'r'``).
+    """
+    if path.endswith('.gz'):
+        return gzip.open(path, mode)
+    if path.endswith('.bz2'):
+        return bz2.open(path, mode)
+    if path.endswith(('.zst', '.zstd')):
+        import zstandard # pylint: disable=import-outside-toplevel
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+def split_lines(path, size):
+    """Split file into newline-aligned byte ranges.
+
+    Parameters
+    ----------
+    path : str
+        Path to an uncompressed file.
+    size : int
+        Approximate size of ranges in bytes.
+
+    Returns
+    -------
+    list of (int, int)
+        Start and end (exclusive) offsets of consecutive ranges.
+    """
+    ranges = []
+    with open(path, 'rb') as f:
+        total = os.fstat(f.fileno()).st_size
+        if not total:
+            return ranges
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = 0
+            while start < total:
+                end = mm.find(b'\n', min(start + size, total) - 1)
+                end = total if end == -1 else end + 1
+                ranges.append((start, end))
+                start = end
+    return ranges
+
+
+def read_lines(path, start, end):
+    """Iterate over lines in a byte range of a memory-mapped file.
+
+    Empty lines are skipped.
+
+    Parameters
+    ----------
+    path : str
+        Path to an uncompressed file.
+    start : int
+        Start offset. It should point at the beginning of a line.
+    end : int
+        End offset (exclusive).
+    """
+    with open(path, 'rb') as f, \
+        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            nl = mm.find(b'\n', pos, end)
+            if nl == -1:
+                nl = end
+            line = mm[pos:nl]
+            pos = nl + 1
+            if line.strip():
+                yield line
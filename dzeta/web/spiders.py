@@ -1,7 +1,7 @@
 """Base _Dzeta_ spider classes."""
 # pylint: disable=no-member
-import json
 from scrapy import Spider
+from .. import codec
 from ..schema import Schema
 
 _SPIDER_ARGS = '__spider_args__'
@@ -49,5 +49,5 @@ class DzetaAPI(DzetaSpider):
     """
     def parse(self, response):
         """Parse JSON response."""
-        data = json.loads(response.body_as_unicode())
+        data = codec.loads(response.body)
         return data
@@ -0,0 +1,100 @@
+"""Synthetic talk page corpus for benchmarks.
+
+Pages are generated with a fixed random seed, so they are identical
+across runs and benchmark results can be compared with stored baselines.
+"""
+import random
+import pytest
+
+
+SEED = 1010
+MONTHS = (
+    'January', 'February', 'March', 'April', 'May', 'June',
+    'July', 'August', 'September', 'October', 'November', 'December'
+)
+WORDS = (
+    'article', 'source', 'consensus', 'revert', 'edit', 'policy',
+    'the', 'a', 'is', 'not', 'this', 'that', 'please', 'see', 'thanks'
+)
+
+
+def make_user_name(rng):
+    return rng.choice(('John', 'Jane', 'Foo', 'Bar', 'Baz')) \
+        + rng.choice(('_', ' ', '')) + str(rng.randint(1, 300))
+
+
+def make_timestamp(rng):
+    return "{:02d}:{:02d}, {} {} {}".format(
+        rng.randint(0, 23), rng.randint(0, 59),
+        rng.randint(1, 28), rng.choice(MONTHS), rng.randint(2002, 2019)
+    )
+
+
+def make_signature(rng):
+    user = make_user_name(rng)
+    return f"[[User:{user}|{user}]] ([[User talk:{user}|talk]]) {make_timestamp(rng)} (UTC)"
+
+
+def make_text(rng, k):
+    return " ".join(rng.choice(WORDS) for _ in range(k))
+
+
+def make_talk_page(n_sections, n_posts, n_words=40, seed=SEED):
+    """Make talk page with `n_sections` sections with `n_posts` posts each."""
+    rng = random.Random(seed)
+    lines = [ "{{Talk header}}" ]
+    for i in range(n_sections):
+        lines.append(f"== Section {i} ==")
+        for _ in range(n_posts):
+            depth = rng.randint(0, 4)
+            lines.append(make_text(rng, rng.randint(1, n_words)))
+            lines.append(":"*depth + make_text(rng, n_words) + " " + make_signature(rng))
+    return "\n".join(lines)
+
+
+def make_adversarial_page(n_lines, n_links, seed=SEED):
+    """Make page with many user links and no timestamps."""
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(n_lines):
+        links = " ".join(
+            f"[[User:{make_user_name(rng)}]] {make_text(rng, 3)}"
+            for _ in range(n_links)
+        )
+        lines.append(links)
+    return "\n".join(lines)
+
+
+CORPUS = {
+    'small': lambda: make_talk_page(n_sections=5, n_posts=4),
+    'huge': lambda: make_talk_page(n_sections=500, n_posts=40),
+    'dense': lambda: make_talk_page(n_sections=50, n_posts=40, n_words=3),
+    'adversarial': lambda: make_adversarial_page(n_lines=20, n_links=500)
+}
+
+
+@pytest.fixture(scope='session')
+def corpus():
+    """Synthetic pages (generated lazily)."""
+    cache = {}
+
+    def get(name):
+        if name not in cache:
+            cache[name] = CORPUS[name]()
+        return cache[name]
+    return get
+
+
+@pytest.fixture(scope='session')
+def raw_user_names():
+    rng = random.Random(SEED)
+    return [
+        rng.choice(('', 'User:', 'User talk:')) + make_user_name(rng) + "&amp;\u200e"
+        for _ in range(5000)
+    ]
+
+
+@pytest.fixture(scope='session')
+def timestamps():
+    rng = random.Random(SEED)
+    return [ make_timestamp(rng) for _ in range(200) ]
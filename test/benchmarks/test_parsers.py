@@ -0,0 +1,80 @@
+"""Benchmarks for `wikiminer.parsers` module.
+
+Run with ``--benchmarks`` (and ``--slow`` for the huge page)
+and use ``--benchmark-autosave`` / ``--benchmark-compare``
+for storing and comparing baselines (see ``make benchmark``).
+"""
+# pylint: disable=redefined-outer-name
+import pytest
+from dzeta.utils import parse_date
+from wikiminer.parsers.wiki import WikiParser, normalize_user_name
+
+
+def parse(source):
+    return list(WikiParser(source).parse_posts())
+
+
+def add_rates(benchmark, pages=None, posts=None, items=None):
+    # There are no stats with `--benchmark-disable`
+    if benchmark.stats is None:
+        return
+    mean = benchmark.stats.stats.mean
+    if pages is not None:
+        benchmark.extra_info['pages_per_second'] = pages / mean
+    if posts is not None:
+        benchmark.extra_info['posts_per_second'] = posts / mean
+    if items is not None:
+        benchmark.extra_info['items_per_second'] = items / mean
+
+
+@pytest.mark.benchmark(group='parse_posts', min_rounds=10)
+@pytest.mark.parametrize('name', [
+    'small',
+    'dense',
+    'adversarial',
+    pytest.param('huge', marks=pytest.mark.slow)
+])
+def test_benchmark_parse_posts(benchmark, corpus, name):
+    source = corpus(name)
+    posts = benchmark(parse, source)
+    add_rates(benchmark, pages=1, posts=len(posts))
+
+
+@pytest.mark.benchmark(group='normalize_user_name', min_rounds=10)
+@pytest.mark.parametrize('cached', [ True, False ])
+def test_benchmark_normalize_user_name(benchmark, raw_user_names, cached):
+    func = normalize_user_name if cached else normalize_user_name.__wrapped__
+
+    def normalize():
+        return [ func(x) for x in raw_user_names ]
+
+    benchmark(normalize)
+    add_rates(benchmark, items=len(raw_user_names))
+
+
+@pytest.mark.benchmark(group='parse_date', min_rounds=5)
+def test_benchmark_parse_date(benchmark, timestamps):
+
+    def parse_dates():
+        return [
+            parse_date(ts, date_formats=WikiParser._date_formats)
+            for ts in timestamps
+        ]
+
+    benchmark(parse_dates)
+    add_rates(benchmark, items=len(timestamps))
+
+
+@pytest.mark.benchmark(group='parse_date', min_rounds=10)
+def test_benchmark_parse_timestamp(benchmark, timestamps):
+    matches = [
+        WikiParser._rx_sig.search(f"[[User:X|X]] {ts} (UTC")
+        for ts in timestamps
+    ]
+
+    def parse_timestamps():
+        WikiParser.parse_timestamp.reset()
+        return [ WikiParser.parse_timestamp(m) for m in matches ]
+
+    benchmark(parse_timestamps)
+    add_rates(benchmark, items=len(timestamps))
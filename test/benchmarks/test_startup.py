@@ -0,0 +1,32 @@
+"""Benchmarks of cold-start time of `wikiminer` modules.
+
+Every round imports modules in a fresh interpreter process
+with no database configured.
+"""
+import os
+import sys
+import subprocess
+import pytest
+
+
+def run_python(code, env):
+    subprocess.run([ sys.executable, '-c', code ], env=env, check=True)
+
+
+@pytest.fixture(scope='module')
+def env():
+    return {
+        k: v for k, v in os.environ.items()
+        if not k.startswith('MONGODB_')
+    }
+
+
+@pytest.mark.benchmark(group='startup')
+@pytest.mark.parametrize('code', [
+    'pass',
+    'from wikiminer.parsers.wiki import WikiParser',
+    'from wikiminer import _',
+    'from wikiminer import _; _.scripts'
+])
+def test_benchmark_startup(benchmark, env, code):
+    benchmark.pedantic(run_python, args=(code, env), rounds=5, iterations=1)
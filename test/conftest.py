@@ -13,6 +13,12 @@ def pytest_addoption(parser):
         help="Run slow tests / benchmarks."""
     )
 
+def pytest_configure(config):
+    """Register custom markers."""
+    config.addinivalue_line(
+        'markers', "slow: slow tests / benchmarks run only with --slow."
+    )
+
 def pytest_collection_modifyitems(config, items):
     """Modify test runner behaviour based on `pytest` settings."""
     run_benchmarks = config.getoption('--benchmarks')
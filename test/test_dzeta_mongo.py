@@ -0,0 +1,176 @@
+"""Tests for `dzeta.db.mongo` module."""
+# pylint: disable=protected-access
+import random
+from copy import deepcopy
+import pytest
+from pymongo import UpdateOne, UpdateMany, InsertOne
+from dzeta.db.mongo import Batcher, coalesce_updates
+
+
+def apply_ops(ops, docs=None):
+    """Apply `$set` / `$unset` update ops to documents in memory."""
+    docs = deepcopy(docs or {})
+    for op in ops:
+        if isinstance(op, InsertOne):
+            docs[op._doc['_id']] = deepcopy(op._doc)
+            continue
+        if isinstance(op, UpdateMany):
+            targets = list(docs)
+        else:
+            pk = op._filter['_id']
+            if pk not in docs:
+                if not op._upsert:
+                    continue
+                docs[pk] = { '_id': pk }
+            targets = [ pk ]
+        for pk in targets:
+            doc = docs[pk]
+            for path, value in op._doc.get('$set', {}).items():
+                *parents, key = path.split('.')
+                obj = doc
+                for parent in parents:
+                    obj = obj.setdefault(parent, {})
+                obj[key] = deepcopy(value)
+            for path in op._doc.get('$unset', {}):
+                *parents, key = path.split('.')
+                obj = doc
+                for parent in parents:
+                    obj = obj.get(parent)
+                    if not isinstance(obj, dict):
+                        break
+                else:
+                    obj.pop(key, None)
+    return docs
+
+
+def update(pk, upsert=True, **kwds):
+    doc = {}
+    if 'set' in kwds:
+        doc['$set'] = kwds['set']
+    if 'unset' in kwds:
+        doc['$unset'] = { k: '' for k in kwds['unset'] }
+    return UpdateOne({ '_id': pk }, doc, upsert=upsert)
+
+
+class TestCoalesceUpdates:
+
+    def test_merge_same_filter(self):
+        ops = [
+            update(1, set={ 'a': 1 }),
+            update(2, set={ 'a': 1 }),
+            update(1, set={ 'b': 2 })
+        ]
+        out = coalesce_updates(ops)
+        assert len(out) == 2
+        assert out[0]._doc == { '$set': { 'a': 1, 'b': 2 } }
+        assert apply_ops(out) == apply_ops(ops)
+
+    @pytest.mark.parametrize('ops', [
+        # Unset after set and set after unset
+        [ update(1, set={ 'a': 1 }), update(1, unset=['a']) ],
+        [ update(1, unset=['a']), update(1, set={ 'a': 1 }) ],
+        [
+            update(1, set={ 'a': 1, 'b': 1 }),
+            update(1, unset=['a']),
+            update(1, set={ 'a': 2 }),
+            update(1, unset=['b'])
+        ],
+        # Last writer wins
+        [ update(1, set={ 'a': 1 }), update(1, set={ 'a': 2 }) ]
+    ])
+    def test_set_unset_order(self, ops):
+        out = coalesce_updates(ops)
+        assert len(out) == 1
+        assert apply_ops(out) == apply_ops(ops)
+
+    @pytest.mark.parametrize('ops', [
+        [ update(1, set={ 'a': { 'x': 1 } }), update(1, set={ 'a.y': 2 }) ],
+        [ update(1, set={ 'a.y': 2 }), update(1, set={ 'a': { 'x': 1 } }) ],
+        [ update(1, unset=['a']), update(1, set={ 'a.y': 2 }) ],
+        # Unsetting a nested field leaves the parent document
+        [ update(1, set={ 'a.b': 1 }), update(1, unset=['a.b']) ]
+    ])
+    def test_dotted_path_barriers(self, ops):
+        out = coalesce_updates(ops)
+        assert len(out) == 2
+        assert apply_ops(out) == apply_ops(ops)
+
+    def test_other_operators_are_barriers(self):
+        inc = UpdateOne({ '_id': 1 }, { '$inc': { 'a': 1 } })
+        ops = [ update(1, set={ 'a': 1 }), inc, update(1, set={ 'b': 1 }) ]
+        out = coalesce_updates(ops)
+        assert out == ops
+
+    def test_update_many_is_barrier(self):
+        many = UpdateMany({}, { '$set': { 'a': 0 } })
+        ops = [ update(1, set={ 'a': 1 }), many, update(1, set={ 'b': 1 }) ]
+        out = coalesce_updates(ops)
+        assert out == ops
+        assert apply_ops(out) == apply_ops(ops)
+
+    def test_different_upsert_not_merged(self):
+        ops = [ update(1, set={ 'a': 1 }), update(1, upsert=False, set={ 'b': 1 }) ]
+        assert len(coalesce_updates(ops)) == 2
+
+    def test_randomized_equivalence(self):
+        rng = random.Random(1)
+        paths = [ 'a', 'b', 'a.x', 'a.y', 'c.x' ]
+        for _ in range(2000):
+            ops = []
+            for _i in range(rng.randint(1, 8)):
+                pk = rng.randint(1, 3)
+                if rng.random() < .05:
+                    ops.append(UpdateMany({}, { '$set': { 'z': rng.random() } }))
+                    continue
+                keys = rng.sample(paths, rng.randint(1, 2))
+                if rng.random() < .3:
+                    ops.append(update(pk, unset=keys))
+                else:
+                    ops.append(update(pk, set={ k: rng.randint(0, 9) for k in keys }))
+            base = { 1: { '_id': 1, 'a': { 'x': 0 } } }
+            try:
+                expected = apply_ops(ops, base)
+            except (AttributeError, TypeError):
+                # Conflicting paths (i.e. 'a.x' in a scalar 'a') fail on the server
+                continue
+            assert apply_ops(coalesce_updates(ops), base) == expected
+
+
+class TestBatcher:
+
+    def test_split_by_count(self):
+        batcher = Batcher(n=3)
+        ops = [ update(i, set={ 'a': i }) for i in range(7) ]
+        assert [ len(b) for b in batcher.batches(ops) ] == [3, 3, 1]
+
+    def test_split_by_size(self):
+        ops = [ update(i, set={ 'a': 'x'*100 }) for i in range(10) ]
+        size = Batcher.get_size(ops[0])
+        batcher = Batcher(max_bytes=size*3)
+        batches = list(batcher.batches(ops))
+        assert [ len(b) for b in batches ] == [3, 3, 3, 1]
+        assert [ op for b in batches for op in b ] == ops
+
+    def test_large_op_in_own_batch(self):
+        small = update(1, set={ 'a': 1 })
+        large = update(2, set={ 'a': 'x'*1000 })
+        batcher = Batcher(max_bytes=Batcher.get_size(small)*2)
+        batches = list(batcher.batches([ small, large, small ]))
+        assert [ len(b) for b in batches ] == [1, 1, 1]
+
+    def test_max_bytes_is_capped(self):
+        batcher = Batcher(max_bytes=10**12)
+        assert batcher.max_bytes <= 32*1024*1024
+
+    def test_adapt_to_latency(self):
+        batcher = Batcher(n=100, latency=1, min_n=10, max_n=400)
+        batcher.update(.1)
+        assert batcher.n == 200
+        batcher.update(.1)
+        batcher.update(.1)
+        assert batcher.n == 400
+        batcher.update(2)
+        assert batcher.n == 200
+        for _ in range(10):
+            batcher.update(2)
+        assert batcher.n == 10
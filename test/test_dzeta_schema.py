@@ -0,0 +1,81 @@
+"""Tests for `dzeta.schema` module."""
+# pylint: disable=redefined-outer-name
+from datetime import datetime
+import pytest
+from marshmallow import ValidationError, validate
+from dzeta.schema import Schema, Loader, fields
+
+
+class PageSchema(Schema):
+    pageid = fields.Integer(required=True, data_key='_id', attribute='id')
+    ns = fields.Integer(required=True, strict=True)
+    title = fields.String(required=True)
+    score = fields.Float(allow_none=True, missing=None)
+    weight = fields.Float(allow_nan=True, missing=None)
+    minor = fields.Boolean(missing=False)
+    timestamp = fields.DateTime(allow_none=True)
+    kind = fields.String(validate=validate.OneOf([ 'a', 'b' ]))
+    tags = fields.List(fields.String(), missing=list)
+
+
+@pytest.fixture
+def schema():
+    return PageSchema()
+
+
+@pytest.fixture
+def loader(schema):
+    return Loader(schema)
+
+
+def load(func, dct, **kwds):
+    try:
+        return func(dct, **kwds)
+    except ValidationError as exc:
+        return ValidationError, exc.messages
+
+
+VALID = { '_id': 1, 'ns': 0, 'title': 'A' }
+
+
+@pytest.mark.parametrize('dct', [
+    VALID,
+    { **VALID, '_id': '2', 'score': '1.5', 'weight': 2 },
+    { **VALID, 'minor': 'true', 'timestamp': '2020-01-01T12:00:00' },
+    { **VALID, 'timestamp': None, 'score': None },
+    { **VALID, 'kind': 'a', 'tags': [ 'x' ], 'extra': { 'a': 1 } },
+    { **VALID, 'weight': 'inf' },
+    # Invalid records
+    { **VALID, 'kind': 'c' },
+    { **VALID, 'ns': '0' },
+    { **VALID, 'ns': True },
+    { **VALID, '_id': 'x' },
+    { **VALID, 'title': None },
+    { **VALID, 'score': 'nan' },
+    { **VALID, 'score': float('inf') },
+    { **VALID, 'timestamp': 'not a date' },
+    { 'ns': 0 }
+])
+@pytest.mark.parametrize('partial', [ False, True ])
+def test_loader_equivalent_to_schema(schema, loader, dct, partial):
+    expected = load(schema.load, dct, partial=partial)
+    assert load(loader, dct, partial=partial) == expected
+
+
+def test_loader_coercion(loader):
+    doc = loader({ **VALID, '_id': '2', 'timestamp': '2020-01-01T12:00:00' })
+    assert doc['id'] == 2
+    assert doc['timestamp'] == datetime(2020, 1, 1, 12)
+    assert doc['minor'] is False
+    assert doc['tags'] == []
+
+
+def test_loader_trusted_skips_required_checks(loader):
+    doc = loader({ '_id': 1, 'title': None }, trusted=True)
+    assert doc['title'] is None
+    assert 'ns' not in doc
+
+
+def test_load_many(schema, loader):
+    dcts = [ { **VALID, '_id': i } for i in range(5) ]
+    assert list(loader.load_many(dcts)) == [ schema.load(d) for d in dcts ]
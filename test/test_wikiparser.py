@@ -0,0 +1,286 @@
+"""Tests for `wikiminer.parsers.wiki` module."""
+# pylint: disable=protected-access
+import re
+import itertools
+from datetime import datetime
+import pytest
+from dzeta.utils import parse_date
+from wikiminer.parsers.wiki import WikiParser, normalize_user_name
+
+
+# Original regex based implementation
+_rx_msg = re.compile(
+    r"(?P<msg>(?<=\n).*)"
+    r"(?P<sig>\[\[User( talk)?:.*?(UTC))",
+    re.IGNORECASE
+)
+_rx_sig = re.compile(
+    r"(?P<username>(?<=:).*?(?=[\/#\|\]]))"
+    r".*?"
+    r"(?P<ts>(\d\d:\d\d)?,?\s*?(\d\d?\s+?[a-z]+\s+?\d{4}|\d{4}\s+?[a-z]+\s+?\d\d?))"
+    r".*?"
+    r"(?P<tz>...$)",
+    re.IGNORECASE
+)
+
+
+def parse_regex(source):
+    for match in _rx_msg.finditer(source):
+        sig = _rx_sig.search(match.group('sig'))
+        if not sig:
+            continue
+        ts = parse_date(sig.group('ts'), date_formats=WikiParser._date_formats)
+        user_name = sig.group('username')
+        if not user_name:
+            continue
+        yield {
+            'user_name': normalize_user_name(user_name),
+            'timestamp': ts,
+            'content': match.group('msg')
+        }
+
+
+def parse(source, **kwds):
+    return list(WikiParser(source, **kwds).parse_posts())
+
+
+SIGNATURES = [
+    "[[User:Foo|Foo]]",
+    "[[User:Foo_bar|Foo bar]] ([[User talk:Foo_bar|talk]])",
+    "[[user talk:foo|talk]]",
+    "[[User:Ba&amp;z|<span style=\"color:red\">Baz</span>]]",
+    "[[User:Qux/sig|Qux]]",
+    "[[User:Quux#top|Quux]]"
+]
+TIMESTAMPS = [
+    "12:00, 1 January 2020 (UTC)",
+    "09:05, 31 Dec 2019 (UTC)",
+    "23:59, 2 February 2021 (utc)",
+    "12:00, 2020 March 5 (UTC)"
+]
+CONTENTS = [
+    "Hello there ",
+    ":Reply ",
+    "::* Nested [[Article|link]] reply ",
+    ""
+]
+
+
+def make_corpus():
+    lines = [ "== Talk ==" ]
+    for content, sig, ts in itertools.product(CONTENTS, SIGNATURES, TIMESTAMPS):
+        lines.append(f"{content}{sig} {ts}")
+        lines.append("Unsigned comment without signature")
+    return "\n".join(lines) + "\n"
+
+
+def test_equals_regex_implementation():
+    source = make_corpus()
+    expected = list(parse_regex(source))
+    posts = [
+        { k: p[k] for k in ('user_name', 'timestamp', 'content') }
+        for p in parse(source)
+    ]
+    assert len(expected) == len(CONTENTS)*len(SIGNATURES)*len(TIMESTAMPS)
+    assert posts == expected
+
+
+def test_offsets_match_content():
+    source = make_corpus()
+    for post in parse(source):
+        assert source[post['start']:post['end']] == post['content']
+
+
+@pytest.mark.parametrize('line,expected', [
+    # Several signatures in one line (the last one is used)
+    ("A [[User:Foo|Foo]] 10:00, 1 May 2020 (UTC) B [[User:Bar|Bar]] 11:00, 2 May 2020 (UTC)",
+     [ ('Bar', datetime(2020, 5, 2, 11)) ]),
+    # Links after the last timestamp do not count
+    ("A [[User:Foo|Foo]] 10:00, 1 May 2020 (UTC) see [[User:Bar]]",
+     [ ('Foo', datetime(2020, 5, 1, 10)) ]),
+    # Unsigned lines
+    ("Just text", []),
+    ("[[User:Foo|Foo]] without a timestamp", []),
+    ("10:00, 1 May 2020 (UTC) without a link", []),
+    # Odd month names
+    ("A [[User:Foo|Foo]] 10:00, 1 Sept 2020 (UTC)", [ ('Foo', datetime(2020, 9, 1, 10)) ]),
+    ("A [[User:Foo|Foo]] 10:00, 1 may 2020 (UTC)", [ ('Foo', datetime(2020, 5, 1, 10)) ]),
+    # Other timezones are not signatures
+    ("A [[User:Foo|Foo]] 10:00, 1 May 2020 (CEST)", []),
+    # Date without time
+    ("A [[User:Foo|Foo]] 1 May 2020 (UTC)", [ ('Foo', datetime(2020, 5, 1)) ])
+])
+def test_edge_cases(line, expected):
+    posts = parse(line + "\n")
+    assert [ (p['user_name'], p['timestamp']) for p in posts ] == expected
+
+
+def test_max_sig_length():
+    timestamp = " 12:00, 1 January 2020 (UTC)"
+    # Maximum-length signature markup
+    sig = "[[User:Foo|" + "x"*(255 - len("[[User:Foo|]]")) + "]]"
+    assert len(sig) == 255
+    assert [ p['user_name'] for p in parse(sig + timestamp) ] == [ 'Foo' ]
+    # Links too far before the timestamp are not signatures
+    too_long = "[[User:Foo]]" + "x"*WikiParser.max_sig_length + timestamp
+    assert parse(too_long) == []
+
+
+def test_first_line():
+    posts = parse("Hi [[User:Foo|Foo]] 12:00, 1 January 2020 (UTC)")
+    assert [ p['content'] for p in posts ] == [ "Hi " ]
+
+
+def test_size_budget():
+    source = make_corpus()
+    parser = WikiParser(source, max_size=len(source) - 1)
+    assert list(parser.parse_posts()) == []
+    assert parser.exceeded == 'size'
+    parser = WikiParser(source, max_size=len(source))
+    assert list(parser.parse_posts())
+    assert parser.exceeded is None
+
+
+def test_time_budget(monkeypatch):
+    monkeypatch.setattr(WikiParser, 'check_every', 1)
+    parser = WikiParser(make_corpus(), time_limit=-1)
+    assert list(parser.parse_posts()) == []
+    assert parser.exceeded == 'time'
+
+
+def test_budget_skips_page():
+    from wikiminer.scripts import _PostsUpdater
+    updater = _PostsUpdater(model=None, parser_kws={ 'max_size': 10 })
+    doc = { '_id': 1, 'source_text': make_corpus() }
+    assert updater(doc) is None
+    assert updater.skipped == [ { '_id': 1, 'reason': 'size' } ]
+
+
+THREAD = """Intro [[User:A|A]] 10:00, 1 May 2020 (UTC)
+== First ==
+Question [[User:B|B]] 10:00, 2 May 2020 (UTC)
+:Answer [[User:C|C]] 11:00, 2 May 2020 (UTC)
+::Follow up [[User:B|B]] 12:00, 2 May 2020 (UTC)
+:*Other answer [[User:D|D]] 13:00, 2 May 2020 (UTC)
+Unsigned line
+#Outdent [[User:E|E]] 14:00, 2 May 2020 (UTC)
+=== Nested ===
+:Indented first post [[User:F|F]] 15:00, 2 May 2020 (UTC)
+Reply [[User:G|G]] 16:00, 2 May 2020 (UTC)
+::Deep reply [[User:A|A]] 17:00, 2 May 2020 (UTC)
+== Second ==
+Start [[User:C|C]] 18:00, 2 May 2020 (UTC)
+"""
+
+
+def test_sections():
+    posts = parse(THREAD)
+    assert [ (p['section'], p['section_title']) for p in posts ] == [
+        (0, None),
+        (1, 'First'), (1, 'First'), (1, 'First'), (1, 'First'), (1, 'First'),
+        (2, 'Nested'), (2, 'Nested'), (2, 'Nested'),
+        (3, 'Second')
+    ]
+
+
+def test_threads():
+    posts = parse(THREAD)
+    assert [ (p['user_name'], p['depth'], p['reply_to']) for p in posts ] == [
+        ('A', 0, None),
+        # First post in a section replies to nothing
+        ('B', 0, None),
+        ('C', 1, 1),
+        ('B', 2, 2),
+        # Mixed indentation characters at the same depth
+        ('D', 2, 2),
+        # Outdent to the level of the first reply
+        ('E', 1, 1),
+        # Headings reset the thread
+        ('F', 1, None),
+        ('G', 0, None),
+        ('A', 2, 7),
+        ('C', 0, None)
+    ]
+
+
+def apply_update(posts, op):
+    """Apply incremental posts update to stored posts."""
+    new = op._doc[0]['$set']['posts']
+    if '$concatArrays' in new:
+        head, new = new['$concatArrays']
+        posts = posts[:head['$slice'][1]]
+    else:
+        posts = []
+    return posts + new['$literal']
+
+
+@pytest.mark.parametrize('old,appended', [
+    (THREAD, ":::Late reply [[User:D|D]] 19:00, 2 May 2020 (UTC)\n"),
+    (THREAD, "== Third ==\nNew [[User:E|E]] 19:00, 2 May 2020 (UTC)\n:Re [[User:F|F]] 20:00, 2 May 2020 (UTC)"),
+    # Growing last line
+    (THREAD.rstrip(), " and [[User:D|D]] 19:00, 2 May 2020 (UTC)\n"),
+    (THREAD.rstrip(), "\n:Reply [[User:D|D]] 19:00, 2 May 2020 (UTC)"),
+    # No posts before the last line
+    ("Hi [[User:A|A]] 10:00, 1 May 2020 (UTC)", "\n:Re [[User:B|B]] 11:00, 1 May 2020 (UTC)")
+])
+def test_incremental_parsing(old, appended):
+    from wikiminer.scripts import _PostsUpdater
+    updater = _PostsUpdater(model=None, incremental=True)
+    new = old + appended
+    posts, state = updater.parse(WikiParser(old))
+    expected, _ = updater.parse(WikiParser(new))
+    # Parsing from the stored state
+    parser = WikiParser(new)
+    tail = list(parser.parse_posts(state['offset'], state=state))
+    assert posts[:state['count']] + tail == expected
+    # Incremental update of a stored page
+    doc = {
+        '_id': 1,
+        'source_text': new,
+        'posts_fingerprint': WikiParser.fingerprint(old),
+        'posts_state': state
+    }
+    op = updater(doc)
+    assert updater.stats['incremental'] == 1
+    assert op._filter == { '_id': 1, 'posts_state.prefix': state['prefix'] }
+    assert apply_update(posts, op) == expected
+
+
+@pytest.mark.parametrize('old,new', [
+    # Changed prefix
+    (THREAD, THREAD.replace("Question", "Changed question") + "Next [[User:A|A]] 19:00, 2 May 2020 (UTC)\n"),
+    # Removed text
+    (THREAD, THREAD[:THREAD.index("== Second")])
+])
+def test_incremental_parsing_full_reparse(old, new):
+    from wikiminer.mongo.models import Page
+    from wikiminer.scripts import _PostsUpdater
+    updater = _PostsUpdater(model=Page, incremental=True)
+    _, state = updater.parse(WikiParser(old))
+    doc = {
+        '_id': 1,
+        'source_text': new,
+        'posts_fingerprint': WikiParser.fingerprint(old),
+        'posts_state': state
+    }
+    op = updater(doc)
+    assert updater.stats['full'] == 1
+    assert 'incremental' not in updater.stats
+    assert op._doc['$set']['posts_fingerprint'] == WikiParser.fingerprint(new)
+    assert len(op._doc['$set']['posts']) == len(parse(new))
+
+
+def test_incremental_parsing_other_version():
+    from wikiminer.mongo.models import Page
+    from wikiminer.scripts import _PostsUpdater
+    updater = _PostsUpdater(model=Page, incremental=True, compact=True)
+    _, state = updater.parse(WikiParser(THREAD))
+    doc = {
+        '_id': 1,
+        'source_text': THREAD + "Next [[User:A|A]] 19:00, 2 May 2020 (UTC)\n",
+        # Posts stored with content
+        'posts_fingerprint': WikiParser.fingerprint(THREAD),
+        'posts_state': state
+    }
+    updater(doc)
+    assert updater.stats['full'] == 1
@@ -1,10 +1,15 @@
-"""Main objects namespace."""
+"""Main objects namespace.
+
+Connection to the database is opened on first use and
+:py:mod:`wikiminer.scripts` is imported on first access,
+so importing this module is cheap.
+"""
 # pylint: disable=wildcard-import,unused-import,unused-wildcard-import,no-member
 import os
+from importlib import import_module
 from configparser import ExtendedInterpolation
 from dzeta.config import Config
 from . import mongo
-from . import scripts
 from .mongo.models import *
 
 
@@ -12,17 +17,44 @@ MODE = os.environ.get('RUNTIME_MODE', 'DEV')
 MODULE_DIR = os.path.dirname(__file__)
 ROOT_DIR = os.path.split(MODULE_DIR)[0]
 
-# Aliases
-s = scripts
+
+def __getattr__(name):
+    # Lazy import of scripts (aliased with `s`)
+    if name in ('scripts', 's'):
+        return import_module('wikiminer.scripts')
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
 
 
 cfg = Config(interpolation=ExtendedInterpolation())
 cfg.read(os.path.join(ROOT_DIR, 'wikiminer.cfg'))
 
-mongo.init(
-    user=cfg.getenvvar(MODE, 'mongo_user'),
-    password=cfg.getenvvar(MODE, 'mongo_pass'),
-    host=cfg.getenvvar(MODE, 'mongo_host'),
-    port=cfg.getenvvar(MODE, 'mongo_port'),
-    db=cfg.getenvvar(MODE, 'mongo_db')
+_mongo_settings = {
+    k: cfg.getenvvar(MODE, f'mongo_{v}', fallback=None)
+    for k, v in (
+        ('user', 'user'),
+        ('password', 'pass'),
+        ('host', 'host'),
+        ('port', 'port'),
+        ('db', 'db')
+    )
+}
+
+# Database may be not configured for instance in parser-only workers
+if None not in _mongo_settings.values():
+    mongo.init(
+        **_mongo_settings,
+        aliases={
+            alias: mongo.get_options(cfg, MODE, alias)
+            for alias in cfg.get(MODE, 'mongo_aliases', fallback='').split(',')
+            if alias.strip()
+        },
+        **mongo.get_options(cfg, MODE)
+    )
+
+_slow_ms = cfg.get(MODE, 'mongo_slow_ms', fallback='').strip()
+_slow_log = cfg.get(MODE, 'mongo_slow_log', fallback='').strip()
+mongo.profile(
+    slow_ms=float(_slow_ms) if _slow_ms else None,
+    path=os.path.join(ROOT_DIR, _slow_log) if _slow_log else None,
+    explain=cfg.get(MODE, 'mongo_slow_explain', fallback='').strip() or None
 )
@@ -6,13 +6,83 @@ pymongo
 mongoengine
 """
 # pylint: disable=wildcard-import
-from mongoengine import connect
+import os
+import logging
+from mongoengine import register_connection, disconnect, DEFAULT_CONNECTION_NAME
+from pymongo.read_preferences import make_read_preference
+from pymongo.read_preferences import read_pref_mode_from_name
+from dzeta.db.mongo import MongoModelInterface, slow_logger
 from .models import *
 
 
-def init(user, password, host, port, db, **kwds):
+#: Alias of the connection used by heavy exports.
+EXPORT_ALIAS = 'export'
+
+_connections = {}
+
+
+def _read_preference(name):
+    return make_read_preference(read_pref_mode_from_name(name), None)
+
+
+#: Client options which can be set in config files (with ``mongo_`` prefix
+#: or ``mongo_<alias>_`` prefix for named connections).
+#: Values are tuples of keyword names and converters.
+OPTIONS = {
+    'max_pool_size': ('maxPoolSize', int),
+    'min_pool_size': ('minPoolSize', int),
+    'max_idle_time_ms': ('maxIdleTimeMS', int),
+    'compressors': ('compressors', str),
+    'zlib_compression_level': ('zlibCompressionLevel', int),
+    'read_preference': ('read_preference', _read_preference),
+    'socket_timeout_ms': ('socketTimeoutMS', int),
+    'connect_timeout_ms': ('connectTimeoutMS', int),
+    'server_selection_timeout_ms': ('serverSelectionTimeoutMS', int),
+    'retry_writes': ('retryWrites', bool)
+}
+
+
+def get_options(cfg, section, alias=None):
+    """Get client options from a config section.
+
+    Parameters
+    ----------
+    cfg : configparser.ConfigParser
+        Config object.
+    section : str
+        Config section.
+    alias : str, optional
+        Connection alias. Options of a named connection default
+        to the options of the default connection.
+
+    Returns
+    -------
+    dict
+        Keyword arguments for :py:func:`mongoengine.register_connection`.
+    """
+    options = {}
+    prefixes = [ 'mongo_' ]
+    if alias is not None:
+        prefixes.append(f'mongo_{alias}_')
+    for prefix in prefixes:
+        for name, (key, converter) in OPTIONS.items():
+            value = cfg.get(section, prefix+name, fallback='').strip()
+            if not value:
+                continue
+            if converter is bool:
+                value = cfg.getboolean(section, prefix+name)
+            else:
+                value = converter(value)
+            options[key] = value
+    return options
+
+
+def init(user, password, host, port, db, aliases=None, **kwds):
     """Initilize Mongoengine ODM.
 
+    Connections are only registered, so clients are created
+    and connected on first use.
+
     Parameters
     ----------
     user : str
@@ -25,8 +95,15 @@ def init(user, password, host, port, db, **kwds):
         Port number.
     db : str
         Database name.
+    aliases : dict, optional
+        Mapping from names of additional connections to their client
+        options overriding `kwds`, i.e. ``{ 'export': { 'read_preference':
+        ReadPreference.SECONDARY_PREFERRED } }``.
+        Named connections can be used with
+        :py:meth:`mongoengine.queryset.QuerySet.using`.
     kwds :
-        Passed to :py:func:`pymodm.connection.connect`.
+        Client options passed to :py:func:`mongoengine.register_connection`
+        such as ``maxPoolSize`` or ``compressors``.
     """
     mongo_uri = 'mongodb://{username}:{password}@{host}:{port}/{db}'
     uri = mongo_uri.format(
@@ -36,4 +113,61 @@ def init(user, password, host, port, db, **kwds):
         port=port,
         db=db
     )
-    connect(host=uri, **kwds)
+    _connections[DEFAULT_CONNECTION_NAME] = dict(host=uri, **kwds)
+    for alias, options in (aliases or {}).items():
+        _connections[alias] = dict(host=uri, **{ **kwds, **options })
+    for alias, settings in _connections.items():
+        register_connection(alias, **settings)
+
+
+def reconnect():
+    """Drop connections, so new ones are opened on first use
+    with the settings used in :py:func:`init`.
+
+    This has to be called in child processes, as *pymongo* clients
+    are not fork-safe.
+    """
+    for alias, settings in _connections.items():
+        disconnect(alias)
+        register_connection(alias, **settings)
+
+
+class _LogFileHandler(logging.FileHandler):
+    """File handler creating the log directory on first write."""
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
+def profile(slow_ms=None, path=None, explain='queryPlanner'):
+    """Configure timing of queries.
+
+    Queries run with :py:meth:`dzeta.db.mongo.MongoModelInterface.aggregate`
+    and :py:meth:`dzeta.db.mongo.MongoModelInterface.find`
+    are logged in the slow-query log when they take too long.
+
+    Parameters
+    ----------
+    slow_ms : float, optional
+        Threshold (in milliseconds) for slow queries.
+        Slow queries are not logged if ``None``.
+    path : str, optional
+        Path of the slow-query log file (in JSON lines format).
+        Entries are only propagated to the root logger if ``None``.
+    explain : str, optional
+        Verbosity of explains of slow queries
+        (see :py:attr:`dzeta.db.mongo.MongoModelInterface.explain_verbosity`).
+        Slow queries are not explained if ``None``.
+    """
+    MongoModelInterface.slow_ms = slow_ms
+    MongoModelInterface.explain_verbosity = explain
+    if path is None:
+        return
+    path = os.path.abspath(path)
+    for handler in slow_logger.handlers:
+        if getattr(handler, 'baseFilename', None) == path:
+            return
+    handler = _LogFileHandler(path, delay=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_logger.addHandler(handler)
+    slow_logger.setLevel(logging.WARNING)
@@ -1,4 +1,9 @@
-"""Mongoengine models."""
+"""Mongoengine models.
+
+Indexes declared in models are not created implicitly.
+They are created (and compared with indexes existing on the server)
+with :py:func:`wikiminer.scripts.sync_indexes`.
+"""
 # pylint: disable=no-member,protected-access
 from datetime import datetime
 from mongoengine import Document, EmbeddedDocument
@@ -6,16 +11,21 @@ from mongoengine import ObjectIdField, BooleanField
 from mongoengine import StringField, DateTimeField
 from mongoengine import IntField, FloatField
 from mongoengine import ListField, DictField, EmbeddedDocumentListField
+from mongoengine import DynamicField, BinaryField
+from dzeta.compress import compress, decompress
 from dzeta.db.mongo import MongoModelInterface
+from ..parsers.wiki import WikiParser
 
 
 __all__ = [
     'Page',
+    'PageSource',
     'UserPage',
     'WikiProjectPage',
     'WikiProject',
     'Revision',
-    'User'
+    'User',
+    'Checkpoint'
 ]
 
 
@@ -48,10 +58,31 @@ class WikiProject(Document):
             { 'fields': ['name'], 'unique': True },
             'subproject',
             'watchers'
-        ]
+        ],
+        'auto_create_index': False
     }
 
 
+def is_compact_source(source, fingerprint):
+    """Check if compact posts can be sliced from a page source.
+
+    Parameters
+    ----------
+    source : str, optional
+        Page source.
+    fingerprint : str, optional
+        Posts fingerprint of the page.
+
+    Returns
+    -------
+    bool
+        ``False`` if there is no source or it does not match
+        the fingerprint (i.e. it was updated without reparsing posts).
+    """
+    return source is not None \
+        and fingerprint == WikiParser.fingerprint(source, compact=True)
+
+
 @MongoModelInterface.inject
 class Post(EmbeddedDocument):
     """User post embedded document.
@@ -64,10 +95,57 @@ class Post(EmbeddedDocument):
         Post timestamp.
     content : StringField
         Post content.
+    section : IntField
+        Index of the section of the page.
+        ``0`` is the lead section before the first heading.
+    section_title : StringField
+        Title of the section.
+    depth : IntField
+        Indentation depth.
+    reply_to : IntField
+        Index of the post this post replies to.
+        ``None`` for posts starting threads.
+    start : IntField
+        Start offset of the content in the page source.
+    end : IntField
+        End offset of the content in the page source.
+        Compact posts store only offsets without content.
     """
     user_name = StringField(required=True)
     timestamp = DateTimeField(required=True)
     content = StringField()
+    section = IntField(default=0)
+    section_title = StringField(null=True)
+    depth = IntField(default=0, min_value=0)
+    reply_to = IntField(null=True)
+    start = IntField(null=True)
+    end = IntField(null=True)
+
+    def get_content(self, source=None):
+        """Get post content.
+
+        Content of compact posts is sliced from the source
+        of the parent page (see :py:meth:`Page.get_compact_source`).
+        ``None`` is returned if the source changed since posts were parsed,
+        as offsets are not valid then, and also if the post is not
+        embedded in a page, as offsets can not be validated then.
+        Use :py:meth:`Page.get_post_contents` for getting content
+        of all posts of a page.
+
+        Parameters
+        ----------
+        source : str, optional
+            Page source. Taken from the parent page if not provided.
+        """
+        if self.content is not None:
+            return self.content
+        page = self._instance
+        if self.start is None or page is None:
+            return None
+        source = page.get_compact_source(source)
+        if source is None:
+            return None
+        return source[self.start:self.end]
 
 
 @MongoModelInterface.inject
@@ -85,7 +163,8 @@ class Page(Document):
     page_type : StringField
         Page type.
     source_text : StringField
-        Wiki source.
+        Wiki source. It may be moved to :py:class:`PageSource`
+        (see :py:meth:`get_source_text`).
     template : ListField(StringField)
         Templates.
     timestamp_updated : DateTimeField
@@ -102,6 +181,15 @@ class Page(Document):
         Page popularity score.
     assessments : ListField(DictField)
         Page assessments
+    posts : EmbeddedDocumentListField(Post)
+        Posts parsed from the source.
+    posts_fingerprint : StringField
+        Fingerprint of the source and the parser version
+        recorded when posts were parsed.
+    posts_state : DictField
+        Parser state at the beginning of the last line of the source
+        (offset, fingerprint of the preceding text, current section etc.)
+        used for incremental parsing of appended text.
     """
     _id = IntField(primary_key=True, alias='pageid')
     ns = IntField(required=True)
@@ -115,19 +203,149 @@ class Page(Document):
     popularity_score = FloatField()
     assessments = ListField(DictField(), default=list)
     posts = EmbeddedDocumentListField(Post, default=list)
+    posts_fingerprint = StringField(null=True)
+    posts_state = DictField(null=True)
     # Settings
     meta = {
         'collection': 'wm_pages',
         'indexes': [
-            'ns',
+            # Serves filtering by namespace and model class at once
+            { 'fields': ['ns', '_cls'], 'cls': False },
             { 'fields': ['title'], 'unique': True, 'cls': False },
-            'page_type'
+            { 'fields': ['page_type'], 'cls': False }
         ],
         'allow_inheritance': True,
         'index_cls': False,
-        'index_drop_dups': True
+        'index_drop_dups': True,
+        'auto_create_index': False
     }
 
+    def get_source_text(self):
+        """Get wiki source.
+
+        Inline source is returned if it exists. Otherwise it is
+        decompressed from :py:class:`PageSource`.
+        Returns ``None`` if there is no source.
+        """
+        if self.source_text is not None:
+            return self.source_text
+        source = PageSource.objects(pk=self.pk).first()
+        return source.text if source is not None else None
+
+    def get_compact_source(self, source=None):
+        """Get source for slicing content of compact posts.
+
+        The source is fetched and checked against `posts_fingerprint`
+        once and cached as long as `posts_fingerprint`
+        and `source_text` do not change.
+
+        Parameters
+        ----------
+        source : str, optional
+            Page source. Fetched with :py:meth:`get_source_text`
+            if not provided.
+
+        Returns
+        -------
+        str
+            Source or ``None`` if there is no source
+            or it changed since posts were parsed.
+        """
+        key = (self.posts_fingerprint, self.source_text)
+        cached = getattr(self, '_compact_source', None)
+        if cached is not None and cached[0] == key \
+        and (source is None or source is cached[1]):
+            return cached[2]
+        if source is None:
+            source = self.get_source_text()
+        checked = source if is_compact_source(source, key[0]) else None
+        self._compact_source = (key, source, checked)
+        return checked
+
+    def get_post_contents(self):
+        """Get content of all posts.
+
+        Returns
+        -------
+        list of str
+            Contents in the order of posts (see :py:meth:`Post.get_content`).
+        """
+        return [ post.get_content() for post in self.posts ]
+
+
+@MongoModelInterface.inject
+class PageSource(Document):
+    """Compressed page source stored out of line.
+
+    Keeping sources in a side collection makes the working set
+    of the pages collection much smaller.
+
+    Attributes
+    ----------
+    _id : IntField
+        Page id. Primary key.
+    data : BinaryField
+        Source compressed with :py:func:`dzeta.compress.compress`.
+    """
+    _id = IntField(primary_key=True, alias='pageid')
+    data = BinaryField(required=True)
+    # Settings
+    meta = {
+        'collection': 'wm_page_sources'
+    }
+
+    @property
+    def text(self):
+        return decompress(self.data)
+
+    @classmethod
+    def from_text(cls, pk, text, **kwds):
+        """Make source document from text.
+
+        Parameters
+        ----------
+        pk : int
+            Page id.
+        text : str
+            Page source.
+        **kwds :
+            Passed to :py:func:`dzeta.compress.compress`.
+        """
+        return cls(pk=pk, data=compress(text, **kwds))
+
+    @classmethod
+    def lookup(cls, as_='source'):
+        """Get aggregation stage joining compressed sources
+        with page documents as a list in `as_` field.
+        """
+        return { '$lookup': {
+            'from': cls._get_collection_name(),
+            'localField': '_id',
+            'foreignField': '_id',
+            'as': as_
+        } }
+
+    @classmethod
+    def missing(cls):
+        """Get aggregation stages filtering pages without sources.
+
+        Pages have no source if `source_text` is missing
+        and there is no compressed source moved out of line.
+        """
+        return [
+            { '$match': { 'source_text': { '$exists': False } } },
+            { '$lookup': {
+                'from': cls._get_collection_name(),
+                'let': { 'id': '$_id' },
+                'pipeline': [
+                    { '$match': { '$expr': { '$eq': [ '$_id', '$$id' ] } } },
+                    { '$project': { '_id': 1 } }
+                ],
+                'as': '_source'
+            } },
+            { '$match': { '_source': { '$size': 0 } } }
+        ]
+
 
 @MongoModelInterface.inject
 class WikiProjectPage(Page):
@@ -154,8 +372,7 @@ class WikiProjectPage(Page):
     # Settings
     meta = {
         'indexes': [
-            '_cls',
-            'wp'
+            { 'fields': ['_cls', 'wp'] }
         ],
         'index_cls': True
     }
@@ -181,8 +398,8 @@ class UserPage(Page):
     # Settings
     meta = {
         'indexes': [
-            '_cls',
-            'user_name'
+            # Used by lookups of userpages of users
+            { 'fields': ['_cls', 'user_name'] }
         ],
         'index_cls': True
     }
@@ -240,16 +457,17 @@ class Revision(Document):
         'collection': 'wm_revisions',
         'indexes': [
             'parent_id',
-            'page_id',
-            'user_name',
-            'ns',
-            'minor',
+            ('page_id', 'timestamp'),
+            # Revisions of hidden users are not indexed
+            {
+                'fields': ['user_name', 'timestamp'],
+                'partialFilterExpression': { 'user_name': { '$type': 'string' } }
+            },
             'timestamp',
-            'size',
-            'rev_size',
             '#sha1'
         ],
-        'index_background': True
+        'index_background': True,
+        'auto_create_index': False
     }
 
 
@@ -297,5 +515,36 @@ class User(Document):
             'registration',
             'emailable',
             'gender'
-        ]
+        ],
+        'auto_create_index': False
+    }
+
+
+@MongoModelInterface.inject
+class Checkpoint(Document):
+    """Checkpoint of a resumable batch job.
+
+    Attributes
+    ----------
+    _id : StringField
+        Job id. Primary key.
+    position : DynamicField
+        Position after the last acknowledged batch.
+        Byte offset in an input file or the last processed `_id`
+        in cursor order.
+    done : BooleanField
+        Flag indicating finished jobs.
+    info : DictField
+        Totals of bulk write results.
+    timestamp_updated : DateTimeField
+        Timestamp of the last update.
+    """
+    _id = StringField(primary_key=True, alias='job')
+    position = DynamicField(null=True)
+    done = BooleanField(default=False)
+    info = DictField(default=dict)
+    timestamp_updated = DateTimeField(default=datetime.utcnow)
+    # Settings
+    meta = {
+        'collection': 'wm_checkpoints'
     }
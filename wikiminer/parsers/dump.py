@@ -0,0 +1,150 @@
+"""Wikipedia XML dumps parser.
+
+It supports ``pages-articles`` and ``pages-meta-current`` dumps,
+both plain XML and *bz2* compressed (including multistream files).
+"""
+import bz2
+from io import BytesIO
+from xml.etree.ElementTree import iterparse
+import attr
+
+
+def _localname(tag):
+    return tag.rsplit('}', 1)[-1]
+
+
+def _children(elem):
+    return { _localname(child.tag): child for child in elem }
+
+
+def _ns_converter(ns):
+    if ns is None:
+        return None
+    if isinstance(ns, int):
+        ns = (ns,)
+    return frozenset(int(x) for x in ns)
+
+
+@attr.s
+class DumpParser:
+    """Streaming parser of Wikipedia XML dumps.
+
+    Pages are yielded as dicts with the same fields as the ones
+    produced by :py:class:`wikiminer.web.spiders.api_pages_cirrus.ApiPagesCirrus`
+    (as far as they are available in dumps). Elements are cleared
+    after being processed, so memory usage does not depend
+    on the size of a dump.
+
+    Attributes
+    ----------
+    ns : int or iterable of int, optional
+        Namespaces to include. All namespaces are included if ``None``.
+    redirects : bool
+        Should redirect pages be included.
+    """
+    ns = attr.ib(default=None, converter=_ns_converter)
+    redirects = attr.ib(default=False)
+
+    def parse(self, stream):
+        """Parse pages from a binary stream.
+
+        Parameters
+        ----------
+        stream : file-like
+            Binary stream with XML dump data.
+        """
+        root = None
+        for event, elem in iterparse(stream, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                continue
+            if _localname(elem.tag) != 'page':
+                continue
+            page = self.make_page(elem)
+            root.clear()
+            if page is not None:
+                yield page
+
+    def parse_block(self, data):
+        """Parse pages from one decompressed block of a multistream dump.
+
+        Parameters
+        ----------
+        data : bytes
+            Sequence of ``<page>`` elements without the enclosing root.
+        """
+        data = data.replace(b'</mediawiki>', b'')
+        stream = BytesIO(b'<pages>' + data + b'</pages>')
+        yield from self.parse(stream)
+
+    def make_page(self, elem):
+        """Make page dict from a ``<page>`` element.
+
+        Returns ``None`` if the page is filtered out.
+        """
+        page = _children(elem)
+        ns = int(page['ns'].text)
+        if self.ns is not None and ns not in self.ns:
+            return None
+        if 'redirect' in page and not self.redirects:
+            return None
+        revision = _children(page['revision'])
+        text = revision.get('text')
+        return {
+            'pageid': int(page['id'].text),
+            'ns': ns,
+            'title': page['title'].text,
+            'page_type': 'page',
+            'source_text': (text.text if text is not None else None) or '',
+            'timestamp_updated': revision['timestamp'].text
+        }
+
+
+def open_dump(path):
+    """Open dump file as a binary stream.
+
+    Files with ``.bz2`` extension are decompressed on the fly.
+    """
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def read_index(path):
+    """Read block offsets from a multistream dump index.
+
+    Parameters
+    ----------
+    path : str
+        Path to a (possibly *bz2* compressed) index file
+        with ``offset:page_id:title`` lines.
+
+    Returns
+    -------
+    list of int
+        Sorted unique offsets of compressed blocks.
+    """
+    offsets = set()
+    with open_dump(path) as stream:
+        for line in stream:
+            offsets.add(int(line.split(b':', 1)[0]))
+    return sorted(offsets)
+
+
+def read_block(path, start, end=None):
+    """Read and decompress a block of a multistream dump.
+
+    Parameters
+    ----------
+    path : str
+        Path to a multistream dump.
+    start : int
+        Offset of the block.
+    end : int, optional
+        Offset of the next block. Read until the end of the file if ``None``.
+    """
+    with open(path, 'rb') as stream:
+        stream.seek(start)
+        data = stream.read(-1 if end is None else end - start)
+    return bz2.decompress(data)
@@ -1,11 +1,115 @@
 """Wikipedia parser."""
 import re
+import sys
 import html
+import time
 import unicodedata
+from collections import Counter
+from hashlib import blake2b
+from datetime import datetime
+from functools import lru_cache
 import attr
 from dzeta.utils import parse_date
 
 
+_MONTHS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4,
+    'may': 5, 'june': 6, 'july': 7, 'august': 8,
+    'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7,
+    'aug': 8, 'sep': 9, 'sept': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+
+
+@attr.s
+class TimestampParser:
+    """Signature timestamp parser.
+
+    Timestamps are built directly from the groups of a signature match
+    using a month names lookup table. Parsed values are memoized
+    and :py:func:`dzeta.utils.parse_date` is used only as a fallback
+    for strings that can not be handled by the fast path.
+
+    Attributes
+    ----------
+    date_formats : tuple of str
+        Date formats passed to :py:func:`dzeta.utils.parse_date`
+        in the fallback mode.
+    maxsize : int
+        Maximum number of memoized timestamps.
+        The cache is cleared when it is full.
+    cache : dict
+        Memoized timestamps.
+    stats : collections.Counter
+        Counters of cache hits (``hits``), fast path parses (``fast``),
+        fallback parses (``fallback``) and unparseable strings (``failed``).
+    """
+    date_formats = attr.ib(default=())
+    maxsize = attr.ib(default=2**16)
+    cache = attr.ib(init=False, factory=dict, repr=False)
+    stats = attr.ib(init=False, factory=Counter, repr=False)
+
+    def __call__(self, match):
+        """Parse timestamp from a signature match.
+
+        Parameters
+        ----------
+        match : re.Match
+            Match object produced by :py:attr:`WikiParser._rx_sig`.
+
+        Raises
+        ------
+        OverflowError
+            If the fallback parser fails with overflow.
+        """
+        ts = match.group('ts')
+        try:
+            dt = self.cache[ts]
+        except KeyError:
+            pass
+        else:
+            self.stats['hits'] += 1
+            return dt
+        dt = self.parse_fast(match)
+        if dt is None:
+            self.stats['fallback'] += 1
+            dt = parse_date(ts, date_formats=self.date_formats)
+            if dt is None:
+                self.stats['failed'] += 1
+        else:
+            self.stats['fast'] += 1
+        if len(self.cache) >= self.maxsize:
+            self.cache.clear()
+        self.cache[ts] = dt
+        return dt
+
+    @staticmethod
+    def parse_fast(match):
+        """Build timestamp from signature match groups.
+
+        Returns ``None`` if the groups can not be interpreted.
+        """
+        day, month, year = match.group('day', 'month', 'year')
+        if day is None:
+            day, month, year = match.group('day_', 'month_', 'year_')
+        month = _MONTHS.get(month.lower())
+        if month is None:
+            return None
+        hour, minute = match.group('hour', 'minute')
+        try:
+            return datetime(
+                int(year), month, int(day),
+                int(hour or 0), int(minute or 0)
+            )
+        except ValueError:
+            return None
+
+    def reset(self):
+        """Clear cache and counters."""
+        self.cache.clear()
+        self.stats.clear()
+
+
 @attr.s
 class WikiParser:
     """Wikipedia parser.
@@ -14,17 +118,34 @@ class WikiParser:
     ----------
     source : src
         Source (Wiki code) of a page.
+    max_size : int, optional
+        Maximum length of a source that will be parsed.
+    time_limit : float, optional
+        Maximum parsing time in seconds.
+    exceeded : str or None
+        Set to ``'size'`` or ``'time'`` when parsing was stopped
+        because of exceeding a budget.
+    section : int
+        Index of the current section.
+        ``0`` is the lead section before the first heading.
+    section_title : str or None
+        Title of the current section.
+    thread : list of tuple
+        Stack of ``(depth, index)`` pairs of posts in the current
+        section used for inferring replies.
+    count : int
+        Number of parsed posts.
     """
     # Class attributes
-    _rx_msg = re.compile(
-        r"(?P<msg>(?<=\n).*)"
-        r"(?P<sig>\[\[User( talk)?:.*?(UTC))",
-        re.IGNORECASE
-    )
+    _rx_link = re.compile(r"\[\[User( talk)?:", re.IGNORECASE)
+    _rx_utc = re.compile(r"UTC", re.IGNORECASE)
+    _rx_heading = re.compile(r"(?P<level>=+)(?P<title>.+?)(?P=level)\s*$")
     _rx_sig = re.compile(
         r"(?P<username>(?<=:).*?(?=[\/#\|\]]))"
         r".*?"
-        r"(?P<ts>(\d\d:\d\d)?,?\s*?(\d\d?\s+?[a-z]+\s+?\d{4}|\d{4}\s+?[a-z]+\s+?\d\d?))"
+        r"(?P<ts>((?P<hour>\d\d):(?P<minute>\d\d))?,?\s*?"
+        r"((?P<day>\d\d?)\s+?(?P<month>[a-z]+)\s+?(?P<year>\d{4})"
+        r"|(?P<year_>\d{4})\s+?(?P<month_>[a-z]+)\s+?(?P<day_>\d\d?)))"
         r".*?"
         r"(?P<tz>...$)",
         re.IGNORECASE
@@ -38,38 +159,285 @@ class WikiParser:
         "%d %b %Y",
         "%B %d, %Y at %H:%M:%S"
     )
+    parse_timestamp = TimestampParser(date_formats=_date_formats)
+    # Has to be changed whenever changes in the parser affect its output
+    version = '3'
+    # Raw signature markup may have up to 255 characters
+    # and it is followed by the timestamp and ``(UTC)``
+    max_sig_length = 300
+    check_every = 256
 
     # Instance attributes
     source = attr.ib(converter=str)
+    max_size = attr.ib(default=None)
+    time_limit = attr.ib(default=None)
+    exceeded = attr.ib(init=False, default=None)
+    section = attr.ib(init=False, default=0)
+    section_title = attr.ib(init=False, default=None)
+    thread = attr.ib(init=False, factory=list, repr=False)
+    count = attr.ib(init=False, default=0)
+
+    @classmethod
+    def fingerprint(cls, source, compact=False):
+        """Get fingerprint of a source and the parser version.
+
+        Parameters
+        ----------
+        source : str
+            Page source.
+        compact : bool
+            Are posts stored without content (only with offsets).
+            Fingerprints of both representations are different,
+            so changing representation requires reparsing.
+
+        Examples
+        --------
+        >>> WikiParser.fingerprint('text') == WikiParser.fingerprint('text')
+        True
+        >>> WikiParser.fingerprint('text') == WikiParser.fingerprint('other')
+        False
+        >>> WikiParser.fingerprint('text') == WikiParser.fingerprint('text', compact=True)
+        False
+        """
+        digest = blake2b(source.encode('utf-8'), digest_size=16).hexdigest()
+        version = cls.version + ('c' if compact else '')
+        return f"{version}:{digest}"
 
     def _remove_format_control(self, x):
-        return "".join(c for c in x if unicodedata.category(c) != 'Cf')
+        return x.translate(get_format_control_table())
 
     def _normalize_user_name(self, x):
-        s = html.unescape(x.strip())
-        s = self._remove_format_control(s)
-        s = self._rx_name.sub(r"", s)
-        s = (s[:1].upper() + s[1:])
-        s = self._rx_ws.sub(r" ", s)
-        return s.strip()
-
-    def parse_posts(self):
-        """Parse posts from the source."""
-        for match in self._rx_msg.finditer(self.source):
-            msg = match.group('msg')
-            sig = self._rx_sig.search(match.group('sig'))
+        return normalize_user_name(x)
+
+    @staticmethod
+    def normalize_user_names(names):
+        """Normalize many user names at once.
+
+        See :py:func:`normalize_user_names`.
+        """
+        return normalize_user_names(names)
+
+    def _find_signature(self, start, end):
+        """Find signature in a line between `start` and `end`.
+
+        Candidates are user links followed by a ``UTC`` string within
+        :py:attr:`max_sig_length` characters. The last candidate in the line
+        is used. Returns a pair of the signature start position and the
+        signature regex match or ``None``.
+        """
+        source = self.source
+        links = [ m.start() for m in self._rx_link.finditer(source, start, end) ]
+        if not links or not self._rx_utc.search(source, links[0], end):
+            return None
+        for pos in reversed(links):
+            utc = self._rx_utc.search(
+                source, pos, min(end, pos + self.max_sig_length)
+            )
+            if utc:
+                return pos, self._rx_sig.search(source[pos:utc.end()])
+        return None
+
+    def _scan_headings(self, start, end):
+        """Update current section using headings in lines
+        beginning between `start` (inclusive) and `end` (exclusive).
+        """
+        source = self.source
+        if start < end and source.startswith('=', start):
+            self._set_section(start)
+        while True:
+            start = source.find('\n=', start, end)
+            if start < 0:
+                break
+            start += 1
+            self._set_section(start)
+
+    def _set_section(self, start):
+        end = self.source.find('\n', start)
+        if end < 0:
+            end = len(self.source)
+        heading = self._rx_heading.match(self.source, start, end)
+        if heading:
+            self.section += 1
+            self.section_title = heading.group('title').strip()
+            self.thread = []
+
+    def _get_depth(self, start, end):
+        depth = 0
+        for c in self.source[start:end]:
+            if c not in ':*#':
+                break
+            depth += 1
+        return depth
+
+    def _get_reply_to(self, depth):
+        thread = self.thread
+        while thread and thread[-1][0] >= depth:
+            thread.pop()
+        reply_to = thread[-1][1] if thread else None
+        thread.append((depth, self.count))
+        return reply_to
+
+    def get_state(self):
+        """Get parser state.
+
+        It can be used to resume parsing with :py:meth:`parse_posts`.
+        """
+        return {
+            'section': self.section,
+            'section_title': self.section_title,
+            'thread': [ list(x) for x in self.thread ],
+            'count': self.count
+        }
+
+    def set_state(self, state=None):
+        """Set parser state.
+
+        Parameters
+        ----------
+        state : dict, optional
+            State as returned by :py:meth:`get_state`.
+            Parser state is reset if ``None``.
+        """
+        state = state or {}
+        self.section = state.get('section', 0)
+        self.section_title = state.get('section_title')
+        self.thread = [ tuple(x) for x in state.get('thread', ()) ]
+        self.count = state.get('count', 0)
+
+    def get_last_line(self):
+        """Get position of the beginning of the last line of the source."""
+        return self.source.rfind('\n') + 1
+
+    def parse_posts(self, start=0, end=None, state=None):
+        """Parse posts from the source.
+
+        The source is scanned line by line and signature regex is run
+        only on short windows around user links, so parsing time
+        is linear in the size of the source.
+        Parsing stops early and :py:attr:`exceeded` is set
+        if :py:attr:`max_size` or :py:attr:`time_limit` is exceeded.
+
+        Sections and indentation depth are detected in the same pass.
+        Every post is assigned to the last preceding less indented post
+        in the same section as a reply (``reply_to`` is its index).
+
+        Parameters
+        ----------
+        start : int
+            Position to start parsing at. Has to be a beginning of a line.
+        end : int, optional
+            Parse only lines beginning before this position.
+        state : dict, optional
+            Parser state to resume from (see :py:meth:`get_state`).
+            Parsing starts from a clean state if not provided.
+        """
+        self.exceeded = None
+        self.set_state(state)
+        source = self.source
+        if self.max_size is not None and len(source) > self.max_size:
+            self.exceeded = 'size'
+            return
+        size = len(source) if end is None else end
+        if self.time_limit is not None:
+            deadline = time.monotonic() + self.time_limit
+        counter = 0
+        pos = start
+        while pos < size:
+            link = source.find('[[', pos, size)
+            if link < 0:
+                self._scan_headings(pos, size)
+                break
+            line_start = source.rfind('\n', 0, link) + 1
+            self._scan_headings(pos, line_start + 1)
+            line_end = source.find('\n', link)
+            if line_end < 0:
+                line_end = len(source)
+            pos = line_end + 1
+            counter += 1
+            if self.time_limit is not None and counter % self.check_every == 0 \
+            and time.monotonic() > deadline:
+                self.exceeded = 'time'
+                return
+            found = self._find_signature(line_start, line_end)
+            if not found:
+                continue
+            sig_start, sig = found
             if not sig:
                 continue
             try:
-                ts = parse_date(sig.group('ts'), date_formats=self._date_formats)
+                ts = self.parse_timestamp(sig)
             except OverflowError:
                 continue
             user_name = sig.group('username')
             if not user_name:
                 continue
+            depth = self._get_depth(line_start, sig_start)
             dct = {
                 'user_name': self._normalize_user_name(user_name),
                 'timestamp': ts,
-                'content': msg
+                'content': source[line_start:sig_start],
+                'start': line_start,
+                'end': sig_start,
+                'section': self.section,
+                'section_title': self.section_title,
+                'depth': depth,
+                'reply_to': self._get_reply_to(depth)
             }
+            self.count += 1
             yield dct
+
+
+@lru_cache(maxsize=None)
+def get_format_control_table():
+    """Get :py:meth:`str.translate` table removing format control
+    characters (unicode category ``Cf``).
+
+    It is built on the first call.
+    """
+    return dict.fromkeys(
+        i for i in range(sys.maxunicode + 1)
+        if unicodedata.category(chr(i)) == 'Cf'
+    )
+
+
+@lru_cache(maxsize=2**16)
+def normalize_user_name(x):
+    """Normalize user name from a signature.
+
+    Results are memoized, as the same user names are repeated
+    across many posts.
+
+    Examples
+    --------
+    >>> normalize_user_name(' User talk:john_doe\u200e ')
+    'John doe'
+    """
+    s = html.unescape(x.strip())
+    s = s.translate(get_format_control_table())
+    s = WikiParser._rx_name.sub(r"", s)
+    s = (s[:1].upper() + s[1:])
+    s = WikiParser._rx_ws.sub(r" ", s)
+    return s.strip()
+
+
+def normalize_user_names(names):
+    """Normalize many user names at once.
+
+    Parameters
+    ----------
+    names : iterable of str
+        Raw user names.
+
+    Returns
+    -------
+    list of str
+        Normalized user names in the original order.
+
+    Examples
+    --------
+    >>> normalize_user_names(['a_b', 'User:a b', 'a_b'])
+    ['A b', 'A b', 'A b']
+    """
+    names = list(names)
+    normalized = { x: normalize_user_name(x) for x in set(names) }
+    return [ normalized[x] for x in names ]
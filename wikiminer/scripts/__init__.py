@@ -4,23 +4,41 @@ They are accessible also from the global `_` object in the `scripts`
 attribute (aliased with `s` attribute).
 """
 # pylint: disable=no-member,protected-access
+import os
 import re
-import json
+from datetime import datetime
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multiprocessing import Pool
+import attr
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from more_itertools import chunked
 from tqdm import tqdm
-from pymongo import UpdateMany
+from pymongo import UpdateOne, UpdateMany, DeleteOne
+from dzeta import codec
+from dzeta.compress import decompress
+from dzeta.utils import COMPRESSED_EXTENSIONS, open_file, split_lines, read_lines
 from wikiminer import _
+from wikiminer.mongo import EXPORT_ALIAS
+from wikiminer.mongo.models import is_compact_source
 from wikiminer.parsers.wiki import WikiParser
+from wikiminer.parsers.dump import DumpParser, open_dump, read_index, read_block
 
+# Bulk write result counts aggregated over batches
+_STATS_KEYS = ('nMatched', 'nModified', 'nUpserted', 'nCoalesced')
 
-def docs_from_json(path, model, n=5000, update_kws=None, **kwds):
+
+def docs_from_json(path, model, n=5000, update_kws=None, trusted=False,
+                   job=None, **kwds):
     """Create/update documents from json(lines) file.
 
     Parameters
     ----------
     path : str
         Path to a file with document per line as a single valid JSON.
+        It may be compressed (see :py:func:`dzeta.utils.open_file`).
     model : interfaced mongoengine collection
         :py:class:`mongoengine.Document` with
         :py:class:`dzeta.db.mongo.MongoModelInterface`.
@@ -30,24 +48,268 @@ def docs_from_json(path, model, n=5000, update_kws=None, **kwds):
     update_kws : dict, optional
         Keyword parameters passed to
         :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    trusted : bool
+        Is the file known to contain valid documents
+        (i.e. produced by a spider or an export).
+        If ``True`` then validation of required and non-nullable
+        fields is skipped.
+    job : str, optional
+        Job id. If provided then the byte offset after each acknowledged
+        batch is recorded and rerunning the job resumes from there.
     **kwds :
         Passed to :py:meth:`dzeta.db.mongo.MongoModelInterface.bulk_write`.
     """
     update_kws = update_kws or {}
+    checkpoint = _Checkpointer(job)
+    if checkpoint.done:
+        return
+    offset = checkpoint.position or 0
 
-    def make_update_op(line):
-        dct = model._.from_json(line, only_dict=True, partial=True)
-        op = model._.dct_to_update(dct, **update_kws)
-        return op
+    def iter_lines(f):
+        position = offset
+        for line in f:
+            position += len(line)
+            yield position, line
 
-    with open(path, 'r') as f:
-        ops = map(make_update_op, f)
-        for info in model._.bulk_write(ops, n=n, **kwds):
+    with open_file(path, 'rb') as f:
+        if offset:
+            f.seek(offset)
+        dcts = model._.from_dicts(
+            map(codec.loads, checkpoint.track(iter_lines(f))),
+            only_dict=True,
+            partial=True,
+            trusted=trusted
+        )
+        ops = (model._.dct_to_update(dct, **update_kws) for dct in dcts)
+        for info in model._.bulk_write(ops, n=n, on_batch=checkpoint.on_batch, **kwds):
             info.pop('upserted', None)
             print(info)
+    checkpoint.finish()
+
 
+def docs_from_json_parallel(path, model, processes=None, chunksize=2**25,
+                            n=5000, update_kws=None, trusted=False,
+                            ordered=False, **kwds):
+    """Create/update documents from json(lines) file in parallel.
+
+    Uncompressed files are split into newline-aligned byte ranges
+    which are memory-mapped, decoded, validated and written by worker
+    processes. Compressed files are decompressed in the main process
+    and chunks of lines are passed to workers.
+
+    Parameters
+    ----------
+    path : str
+        Path to a file with document per line as a single valid JSON.
+        It may be compressed (see :py:func:`dzeta.utils.open_file`).
+    model : interfaced mongoengine collection
+        :py:class:`mongoengine.Document` with
+        :py:class:`dzeta.db.mongo.MongoModelInterface`.
+    processes : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    chunksize : int
+        Approximate size in bytes of a chunk of lines processed
+        by a worker in one task.
+    n : int
+        Batch size for updating.
+        Full batch if falsy or non-positive.
+    update_kws : dict, optional
+        Keyword parameters passed to
+        :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    trusted : bool
+        Is the file known to contain valid documents.
+        See :py:func:`docs_from_json`.
+    ordered : bool
+        Should batches be written in order.
+        Order of batches written by different workers is never guaranteed.
+    **kwds :
+        Passed to :py:meth:`dzeta.db.mongo.MongoModelInterface.bulk_write`.
+    """
+    kwds = { 'ordered': ordered, **kwds }
+    updater = _DocsUpdater(model, update_kws=update_kws or {}, trusted=trusted)
+    processes = processes or os.cpu_count()
+    totals = Counter()
+
+    if path.endswith(COMPRESSED_EXTENSIONS):
+        def iter_args():
+            with open_file(path, 'rb') as f:
+                for lines in _chunk_lines(f, chunksize):
+                    yield (updater, lines, n, kwds)
+        args = iter_args()
+        total = None
+    else:
+        args = [
+            (updater, (path, start, end), n, kwds)
+            for start, end in split_lines(path, chunksize)
+        ]
+        total = len(args)
 
-def make_wp_pages(n=5000, update_kws=None, **kwds):
+    with Pool(processes, initializer=_.mongo.reconnect) as pool:
+        progress = tqdm(total=total)
+        pending = deque()
+        for arg in args:
+            if len(pending) >= 2*processes:
+                totals.update(pending.popleft().get())
+                progress.update()
+                progress.set_postfix(**totals)
+            pending.append(pool.apply_async(_docs_from_json_chunk, (arg,)))
+        while pending:
+            totals.update(pending.popleft().get())
+            progress.update()
+            progress.set_postfix(**totals)
+        progress.close()
+    print(dict(totals))
+
+
+@attr.s
+class _DocsUpdater:
+    """Make update ops from JSON lines."""
+    model = attr.ib()
+    update_kws = attr.ib(factory=dict)
+    trusted = attr.ib(default=False)
+
+    def __call__(self, lines):
+        dcts = self.model._.from_dicts(
+            map(codec.loads, lines),
+            only_dict=True,
+            partial=True,
+            trusted=self.trusted
+        )
+        for dct in dcts:
+            yield self.model._.dct_to_update(dct, **self.update_kws)
+
+
+def _chunk_lines(stream, size):
+    chunk = []
+    nbytes = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        chunk.append(line)
+        nbytes += len(line)
+        if nbytes >= size:
+            yield chunk
+            chunk = []
+            nbytes = 0
+    if chunk:
+        yield chunk
+
+
+def _docs_from_json_chunk(args):
+    updater, lines, n, kwds = args
+    if isinstance(lines, tuple):
+        lines = read_lines(*lines)
+    stats = Counter()
+    for info in updater.model._.bulk_write(updater(lines), n=n, **kwds):
+        stats.update({
+            k: v for k, v in info.items()
+            if k in _STATS_KEYS
+        })
+    return stats
+
+
+def pages_from_dump(path, model, index_path=None, ns=None, processes=None,
+                    blocks=50, posts=False, n=5000, update_kws=None, **kwds):
+    """Create/update page documents from Wikipedia XML dump.
+
+    Fields are mapped in the same way as in the cirrus spiders,
+    so this is an offline alternative for getting page sources.
+
+    Parameters
+    ----------
+    path : str
+        Path to a dump file (``pages-articles`` or ``pages-meta-current``).
+        It may be *bz2* compressed.
+    model : interfaced mongoengine collection
+        :py:class:`mongoengine.Document` with
+        :py:class:`dzeta.db.mongo.MongoModelInterface`.
+    index_path : str, optional
+        Path to the index of a multistream dump. If provided then
+        blocks are decompressed and parsed in parallel worker processes.
+        Otherwise the dump is streamed in the current process.
+    ns : int or iterable of int, optional
+        Namespaces to include. All namespaces are included if ``None``.
+    processes : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    blocks : int
+        Number of multistream blocks (of 100 pages) processed
+        by a worker in one task.
+    posts : bool
+        Should posts be parsed with
+        :py:class:`wikiminer.parsers.wiki.WikiParser` at once.
+    n : int
+        Batch size for updating.
+        Full batch if falsy or non-positive.
+    update_kws : dict, optional
+        Keyword parameters passed to
+        :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    **kwds :
+        Passed to :py:meth:`dzeta.db.mongo.MongoModelInterface.bulk_write`.
+    """
+    parser = DumpParser(ns=ns)
+    updater = _DumpPageUpdater(model, update_kws=update_kws or {}, posts=posts)
+    if index_path is None:
+        with open_dump(path) as stream:
+            ops = map(updater, parser.parse(stream))
+            for info in model._.bulk_write(ops, n=n, **kwds):
+                info.pop('upserted', None)
+                print(info)
+        return
+    offsets = read_index(index_path)
+    ranges = list(zip(offsets, [ *offsets[1:], None ]))
+    args = [
+        (updater, parser, path, chunk, n, kwds)
+        for chunk in chunked(ranges, n=blocks)
+    ]
+    totals = Counter()
+    processes = processes or os.cpu_count()
+    with Pool(processes, initializer=_.mongo.reconnect) as pool:
+        progress = tqdm(pool.imap_unordered(_pages_from_dump_blocks, args), total=len(args))
+        for stats in progress:
+            totals.update(stats)
+            progress.set_postfix(**totals)
+    print(dict(totals))
+
+
+@attr.s
+class _DumpPageUpdater:
+    """Make update ops from dump pages."""
+    model = attr.ib()
+    update_kws = attr.ib(factory=dict)
+    posts = attr.ib(default=False)
+
+    def __call__(self, page):
+        dct = self.model._.from_dict(page, only_dict=True, partial=True)
+        if self.posts:
+            source = dct['source_text']
+            parsed = _PostsUpdater(self.model).parse(WikiParser(source))
+            dct.update(
+                posts=parsed[0],
+                posts_fingerprint=WikiParser.fingerprint(source),
+                posts_state=parsed[1]
+            )
+        op = self.model._.dct_to_update(dct, **self.update_kws)
+        return op
+
+
+def _pages_from_dump_blocks(args):
+    updater, parser, path, ranges, n, kwds = args
+    stats = Counter()
+
+    def iter_pages():
+        for start, end in ranges:
+            yield from parser.parse_block(read_block(path, start, end))
+
+    ops = map(updater, iter_pages())
+    for info in updater.model._.bulk_write(ops, n=n, **kwds):
+        stats.update({
+            k: v for k, v in info.items()
+            if k in _STATS_KEYS
+        })
+    return stats
+
+
+def make_wp_pages(n=5000, update_kws=None, workers=2, **kwds):
     """Update `Page` documents and create `WikiProjectPage` subcollection.
 
     Parameters
@@ -58,6 +320,11 @@ def make_wp_pages(n=5000, update_kws=None, **kwds):
     update_kws : dict, optional
         Keyword parameters passed to
         :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    workers : int
+        Number of concurrent API requests when correcting WP names.
+        Requests failing with ``429`` or ``5xx`` statuses are retried
+        with exponential backoff. Names of batches which still fail
+        are reported and their pages are left untouched.
     **kwds :
         Passed to :py:meth:`dzeta.db.mongo.MongoModelInterface.bulk_write`.
     """
@@ -86,65 +353,127 @@ def make_wp_pages(n=5000, update_kws=None, **kwds):
         op = _.WikiProjectPage._.dct_to_update(doc)
         return op
 
-    cursor = _.Page.objects.aggregate(match, project)
+    cursor = _.Page._.aggregate(match, project)
     ops = map(make_update_op, cursor)
     for info in _.WikiProjectPage._.bulk_write(ops, n=n, **kwds):
         info.pop('inserted', None)
         print(info)
     # Correct WP
     print("Correcting WP names ...")
-    base_url = "https://en.wikipedia.org/w/api.php?action=query&prop=cirrusdoc&titles={titles}&format=json"
-    # Set ops
-    ops = []
-    # Correction loop
-    for names in tqdm(list(chunked(_.WikiProjectPage.objects.distinct('wp_raw'), n=50))):
-        titles = "|".join("Wikipedia:WikiProject "+name for name in names)
-        url = base_url.format(titles=titles)
-        response = requests.get(url)
-        body = response.json()
-        pages = body['query']['pages']
-        for pid, data in pages.items():
-            pid = int(pid)
-            wp_title_raw = wp_title = rx_rm.match(data['title']).group(2)
-            try:
-                cirrus = data.pop('cirrusdoc').pop()
-            except (IndexError, KeyError):
-                cirrus = None
-            if pid < 0 or cirrus is None:
-                op = {
-                    'set___cls': _.Page._class_name,
-                    'unset__wp': '',
-                    'unset__wp_raw': ''
-                }
-            else:
-                cirrus_pid = int(cirrus['id'])
-                if cirrus_pid != pid:
-                    m = rx_rm.match(cirrus['source']['title'])
-                    if m is None:
-                        op = {
-                            'set___cls': _.Page._class_name,
-                            'unset__wp': '',
-                            'unset__wp_raw': ''
-                        }
-                    else:
-                        wp_title = m.group(2)
-                op = { 'set__wp': wp_title }
-            flt = { '_cls': _.WikiProjectPage._class_name, 'wp_raw': wp_title_raw }
-            _.WikiProjectPage.objects(**flt).update(**op)
-    # Second correction loop (what the FUCK MONGODB!!)
-    cursor = _.WikiProjectPage.objects.aggregate(
-        { '$match': { 'wp': { '$exists': False } } },
-        { '$sortByCount': '$wp_raw' },
+    # Streaming aggregation is not limited by the size of `distinct` results
+    cursor = _.WikiProjectPage._.aggregate(
+        { '$group': { '_id': '$wp_raw' } },
         allowDiskUse=True
     )
-    print("Second correction loop ...")
-    for doc in tqdm(cursor):
-        _.WikiProjectPage.objects(wp_raw=doc['_id']).update(set__wp=doc['_id'])
+    names = [ doc['_id'] for doc in cursor if doc['_id'] is not None ]
+    cls = _.WikiProjectPage._class_name
+    totals = Counter()
+    failed = []
+
+    def write(ops):
+        for info in _.WikiProjectPage._.bulk_write(ops, n=n, **kwds):
+            totals.update({ k: v for k, v in info.items() if k in _STATS_KEYS })
+
+    with requests.Session() as session, \
+        ThreadPoolExecutor(max_workers=workers) as executor:
+        retry = Retry(
+            total=5,
+            backoff_factor=2,
+            status_forcelist=(429, 500, 502, 503, 504)
+        )
+        adapter = HTTPAdapter(pool_maxsize=workers, max_retries=retry)
+        session.mount('https://', adapter)
+        futures = {
+            executor.submit(_fetch_wp_pages, session, batch): batch
+            for batch in chunked(names, n=50)
+        }
+        # Results are written as they come, so failures do not discard them
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            try:
+                pages = future.result()
+            except (requests.RequestException, ValueError) as exc:
+                print(f"Failed to fetch {len(futures[future])} WP names: {exc}")
+                failed.extend(futures[future])
+                continue
+            # Pages without resolved names are reset to plain pages
+            # and the other ones get their names without per-name round trips
+            ops = []
+            for pid, data in pages.items():
+                wp_raw, wp = _resolve_wp_name(int(pid), data, rx_rm)
+                ops.append(UpdateMany(
+                    { '_cls': cls, 'wp_raw': wp_raw },
+                    { '$set': { '_cls': _.Page._class_name },
+                      '$unset': { 'wp': '', 'wp_raw': '' } }
+                    if wp is None else { '$set': { 'wp': wp } }
+                ))
+            write(ops)
+    # Second correction loop
+    # Pages with names not returned by the API keep their raw names
+    write([ UpdateMany(
+        { '_cls': cls, 'wp': { '$exists': False }, 'wp_raw': { '$nin': failed } },
+        [ { '$set': { 'wp': '$wp_raw' } } ]
+    ) ])
+    print(dict(totals))
+    if failed:
+        print(f"Failed to correct {len(failed)} WP names (rerun to retry)")
+
+
+_WP_API_URL = "https://en.wikipedia.org/w/api.php"
+
 
+def _fetch_wp_pages(session, names):
+    params = {
+        'action': 'query',
+        'prop': 'cirrusdoc',
+        'titles': "|".join("Wikipedia:WikiProject "+name for name in names),
+        'format': 'json'
+    }
+    response = session.get(_WP_API_URL, params=params)
+    response.raise_for_status()
+    body = codec.loads(response.content)
+    if 'error' in body:
+        error = body['error']
+        raise requests.HTTPError(
+            f"API error {error.get('code')}: {error.get('info')}",
+            response=response
+        )
+    return body.get('query', {}).get('pages', {})
 
-def make_user_pages(n=10000, update_kws=None, **kwds):
+
+def _resolve_wp_name(pid, data, rx_rm):
+    """Resolve WP name of a page returned by the API.
+
+    Redirects are detected by ids of cirrus documents different from
+    page ids and resolved to names of their targets.
+
+    Returns
+    -------
+    tuple
+        Raw name and resolved name (``None`` if there is no such WP).
+    """
+    wp_title_raw = wp_title = rx_rm.match(data['title']).group(2)
+    try:
+        cirrus = data.pop('cirrusdoc').pop()
+    except (IndexError, KeyError):
+        cirrus = None
+    if pid < 0 or cirrus is None:
+        return wp_title_raw, None
+    if int(cirrus['id']) != pid:
+        m = rx_rm.match(cirrus['source']['title'])
+        if m is None:
+            return wp_title_raw, None
+        wp_title = m.group(2)
+    return wp_title_raw, wp_title
+
+
+def make_user_pages(n=10000, update_kws=None, full=False, since=None,
+                    job=None, **kwds):
     """Detect and convert page documents corresponding to user pages.
 
+    By default only pages which are not yet user pages or which were
+    renamed (so their user names changed) are updated, and user pages
+    moved out of user namespaces are turned back into plain pages.
+
     Parameters
     ----------
     n : int
@@ -153,18 +482,38 @@ def make_user_pages(n=10000, update_kws=None, **kwds):
     update_kws : dict, optional
         Keyword parameters passed to
         :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    full : bool
+        Should all user pages be reset and rebuilt from scratch.
+    since : datetime.datetime, optional
+        High-water mark. If provided then only pages with `timestamp_record`
+        not older than it are considered.
+    job : str, optional
+        Job id. If provided then the last `_id` of each acknowledged
+        batch is recorded and rerunning the job resumes from there.
     **kwds :
         Passed to :py:meth:`dzeta.db.mongo.MongoModelInterface.bulk_write`.
     """
     update_kws = update_kws or {}
-    # Reset user pages
-    _.UserPage.objects.update(set___cls=_.Page._class_name)
-    cursor = _.Page.objects.aggregate(
-        { '$match': {
-            'ns': { '$in': [2, 3] }
-        } },
+    checkpoint = _Checkpointer(job)
+    if checkpoint.done:
+        return
+    cls = _.UserPage._class_name
+    match = { 'ns': { '$in': [2, 3] } }
+    if since is not None:
+        match['timestamp_record'] = { '$gte': since }
+    if checkpoint.position is None:
+        # Reset user pages
+        reset = {} if full else { 'ns': { '$nin': [2, 3] } }
+        _.UserPage.objects(__raw__=reset).update(set___cls=_.Page._class_name)
+    else:
+        match['_id'] = { '$gt': checkpoint.position }
+    pipeline = [
+        { '$match': match },
+        { '$sort': { '_id': 1 } },
         { '$project': {
             'title': 1,
+            '_cls': 1,
+            'user_name': 1,
             'start': { '$add': [
                 { '$indexOfCP': [ '$title', ':' ] },
                 1
@@ -178,21 +527,31 @@ def make_user_pages(n=10000, update_kws=None, **kwds):
                 { '$strLenCP': '$title' },
             ] }
         } },
-        { '$project': {
-            'user_name': { '$substrCP': [
+        { '$addFields': {
+            'name': { '$substrCP': [
                 '$title', '$start', { '$subtract': [ '$end', '$start' ] }
             ] }
-        } },
-        allowDiskUse=True
+        } }
+    ]
+    if not full:
+        pipeline.append({ '$match': { '$expr': { '$or': [
+            { '$ne': [ '$_cls', cls ] },
+            { '$ne': [ '$user_name', '$name' ] }
+        ] } } })
+    pipeline.append({ '$project': { 'user_name': '$name' } })
+    cursor = _.Page._.aggregate(*pipeline, allowDiskUse=True)
+    ops = checkpoint.track(
+        (d['_id'], _.UserPage._.dct_to_update(d, **update_kws)) for d in cursor
     )
-    # pylint: disable=unnecessary-lambda
-    ops = map(lambda d: _.UserPage._.dct_to_update(d, **update_kws), cursor)
-    for info in _.UserPage._.bulk_write(ops, n=n, **kwds):
+    for info in _.UserPage._.bulk_write(ops, n=n, on_batch=checkpoint.on_batch, **kwds):
         info.pop('upserted', None)
         print(info)
+    checkpoint.finish()
 
 
-def parse_posts(model, cursor, n=5000, update_kws=None, **kwds):
+def parse_posts(model, cursor, n=5000, update_kws=None, parser_kws=None,
+                skip_unchanged=False, incremental=False, compact=False,
+                job=None, **kwds):
     """Parse posts from pages' content and update them in the databse.
 
     Parameters
@@ -200,42 +559,571 @@ def parse_posts(model, cursor, n=5000, update_kws=None, **kwds):
     model : interfaced mongoengine collection
         :py:class:`mongoengine.Document` with
         :py:class:`dzeta.db.mongo.MongoModelInterface`.
-    cursor : pymongo.command_cursor.CommandCursor
-        Cursor for iterating over documents.
-        Documents must contain `_id` and `source_text` fields.
+    cursor : pymongo.command_cursor.CommandCursor or dict
+        Cursor for iterating over documents or a raw query selecting them.
+        Documents matching a query are fetched sorted by `_id`
+        with all fields used for parsing.
+        Documents of a cursor must contain `_id` and `source_text` fields
+        (sources stored in :py:class:`wikiminer.mongo.models.PageSource`
+        are used if `source_text` is missing, preferably joined with
+        :py:meth:`wikiminer.mongo.models.PageSource.lookup`)
+        and also `posts_fingerprint` field if `skip_unchanged`
+        or `incremental` is used and `posts_state` field
+        if `incremental` is used.
     n : int
         Batch size for updating.
         Full batch if falsy or non-positive.
     update_kws : dict, optional
         Keyword parameters passed to
         :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    parser_kws : dict, optional
+        Keyword parameters passed to
+        :py:class:`wikiminer.parsers.wiki.WikiParser`.
+        Can be used to set size and time budgets for pages.
+    skip_unchanged : bool
+        Should pages with fingerprints of the source, the parser
+        version and the posts representation (see `compact`)
+        equal to the stored `posts_fingerprint` be skipped.
+    incremental : bool
+        Should only text appended since the last parsing be parsed
+        (starting from the last line, which may have grown)
+        and existing posts from that point be replaced with new ones.
+        The whole page is reparsed if the previously parsed part
+        of the source (stored in `posts_state`) changed
+        or if posts were parsed by another parser version
+        or stored in another representation.
+    compact : bool
+        Should posts be stored without content, only with `start`
+        and `end` offsets of the content in the source.
+    job : str, optional
+        Job id. If provided then the last `_id` of each acknowledged
+        batch is recorded and rerunning the job skips documents
+        up to it. A query is then resumed on the server side.
+        A cursor has to be sorted by `_id` and documents up to
+        the recorded position are skipped only on the client,
+        so callers passing cursors should filter them with
+        ``{ '_id': { '$gt': position } }`` (see
+        :py:class:`wikiminer.mongo.models.Checkpoint`).
     **kwds :
         Passed to :py:meth:dzeta.db.mongo.MongoModelInterface.bulk_write`.
+
+    Returns
+    -------
+    list of dict
+        Pages skipped because of exceeding parser budgets.
+
+    See Also
+    --------
+    parse_posts_parallel : multi-process variant
     """
-    update_kws = update_kws or {}
-    counter = 0
+    updater = _PostsUpdater(
+        model=model,
+        update_kws=update_kws or {},
+        parser_kws=parser_kws or {},
+        skip_unchanged=skip_unchanged,
+        incremental=incremental,
+        compact=compact
+    )
+
+    checkpoint = _Checkpointer(job)
+    if checkpoint.done:
+        return updater.skipped
+    if isinstance(cursor, dict):
+        cursor = _get_posts_cursor(model, cursor, checkpoint.position)
+    elif checkpoint.position is not None:
+        cursor = (d for d in cursor if d['_id'] > checkpoint.position)
 
     def make_update_op(doc):
-        parser = WikiParser(doc.get('source_text', ''))
-        nonlocal counter
-        counter += 1
-        _id = doc['_id']
-        print(f"\rItem {counter}|id={_id}", end="")
-        posts = list(parser.parse_posts())
+        print(f"\rItem {updater.stats['pages']+1}|id={doc['_id']}", end="")
+        return doc['_id'], updater(doc)
+
+    ops = checkpoint.track(map(make_update_op, cursor))
+    for info in model._.bulk_write(ops, n=n, on_batch=checkpoint.on_batch, **kwds):
+        info.pop('upserted', None)
+        print(info)
+    checkpoint.finish()
+    print("Timestamps:", dict(WikiParser.parse_timestamp.stats))
+    print("Pages:", dict(updater.stats))
+    if updater.skipped:
+        print(f"Skipped {len(updater.skipped)} pages exceeding parser budgets")
+    return updater.skipped
+
+
+def parse_posts_parallel(model, query=None, processes=None, shard=None,
+                         n=5000, update_kws=None, parser_kws=None,
+                         skip_unchanged=False, incremental=False, compact=False,
+                         job=None, **kwds):
+    """Parse posts in parallel worker processes.
+
+    The `_id` space of the model is split into shards with ``$mod``
+    queries and every shard is processed by a worker process with its own
+    connection, projected cursor and batched bulk writes.
+
+    Parameters
+    ----------
+    model : interfaced mongoengine collection
+        :py:class:`mongoengine.Document` with
+        :py:class:`dzeta.db.mongo.MongoModelInterface`.
+        It has to have integer primary keys.
+    query : dict, optional
+        Raw query for selecting documents.
+    processes : int, optional
+        Number of worker processes. Defaults to the number of CPUs.
+    shard : str, optional
+        Part of the job to run on this machine given as ``'i/N'``,
+        i.e. ``'0/2'`` and ``'1/2'`` split the job between two machines.
+        The whole job is run if not provided.
+    n : int
+        Batch size for updating.
+        Full batch if falsy or non-positive.
+    update_kws : dict, optional
+        Keyword parameters passed to
+        :py:meth:`dzeta.db.mongo.MongoModelInterface.to_update`.
+    parser_kws : dict, optional
+        Keyword parameters passed to
+        :py:class:`wikiminer.parsers.wiki.WikiParser`.
+    skip_unchanged : bool
+        Should pages with unchanged fingerprints be skipped.
+        See :py:func:`parse_posts`.
+    incremental : bool
+        Should only appended text be parsed.
+        See :py:func:`parse_posts`.
+    compact : bool
+        Should posts be stored without content.
+        See :py:func:`parse_posts`.
+    job : str, optional
+        Job id. If provided then progress of every shard is recorded
+        and rerunning the job resumes all shards.
+        Jobs have to be rerun with the same `processes` and `shard`.
+    **kwds :
+        Passed to :py:meth:dzeta.db.mongo.MongoModelInterface.bulk_write`.
+
+    Returns
+    -------
+    collections.Counter
+        Totals from all workers.
+    list of dict
+        Pages skipped because of exceeding parser budgets.
+    """
+    index, total = parse_shard(shard)
+    processes = processes or os.cpu_count()
+    updater = _PostsUpdater(
+        model=model,
+        update_kws=update_kws or {},
+        parser_kws=parser_kws or {},
+        skip_unchanged=skip_unchanged,
+        incremental=incremental,
+        compact=compact
+    )
+    # Several shards per process, so workers are balanced
+    # and the progress report is updated often.
+    nshards = processes*4
+    modulo = total*nshards
+    args = [
+        (
+            updater,
+            _shard_query(query, modulo, index + i*total),
+            f"{job}:{index + i*total}/{modulo}" if job else None,
+            n,
+            kwds
+        )
+        for i in range(nshards)
+    ]
+    totals = Counter()
+    skipped = []
+    with Pool(processes, initializer=_.mongo.reconnect) as pool:
+        progress = tqdm(pool.imap_unordered(_parse_posts_shard, args), total=nshards)
+        for stats, _skipped in progress:
+            totals.update(stats)
+            skipped.extend(_skipped)
+            progress.set_postfix(**totals)
+    print(dict(totals))
+    return totals, skipped
+
+
+def parse_shard(shard=None):
+    """Parse shard specification.
+
+    Parameters
+    ----------
+    shard : str, optional
+        Shard given as ``'i/N'``. ``'0/1'`` is assumed if not provided.
+
+    Returns
+    -------
+    tuple of int
+        Shard index and total number of shards.
+
+    Raises
+    ------
+    ValueError
+        If `shard` is not a valid shard specification.
+
+    Examples
+    --------
+    >>> parse_shard('1/4')
+    (1, 4)
+    >>> parse_shard()
+    (0, 1)
+    """
+    if shard is None:
+        return 0, 1
+    try:
+        index, total = map(int, shard.split('/'))
+    except ValueError:
+        raise ValueError(f"Incorrect shard '{shard}' (has to be 'i/N')")
+    if not 0 <= index < total:
+        raise ValueError(f"Incorrect shard '{shard}' (has to be 0 <= i < N)")
+    return index, total
+
+
+def _shard_query(query, modulo, remainder):
+    flt = { '_id': { '$mod': [ modulo, remainder ] } }
+    if query:
+        flt = { '$and': [ query, flt ] }
+    return flt
+
+
+@attr.s
+class _PostsUpdater:
+    """Make post update ops from page documents."""
+    model = attr.ib()
+    update_kws = attr.ib(factory=dict)
+    parser_kws = attr.ib(factory=dict)
+    skip_unchanged = attr.ib(default=False)
+    incremental = attr.ib(default=False)
+    compact = attr.ib(default=False)
+    stats = attr.ib(init=False, factory=Counter)
+    skipped = attr.ib(init=False, factory=list)
+
+    def __call__(self, doc):
+        self.stats['pages'] += 1
+        source = _get_source_text(doc)
+        fingerprint = WikiParser.fingerprint(source, compact=self.compact)
+        if self.skip_unchanged and fingerprint == doc.get('posts_fingerprint'):
+            self.stats['unchanged'] += 1
+            return None
+        parser = WikiParser(source, **self.parser_kws)
+        state = doc.get('posts_state') if self.incremental else None
+        # Posts can be appended only to posts in the same representation
+        version = fingerprint.split(':')[0]
+        if state \
+        and (doc.get('posts_fingerprint') or '').split(':')[0] == version \
+        and WikiParser.fingerprint(source[:state['offset']]) == state['prefix']:
+            parsed = self.parse(parser, state['offset'], state)
+            if parsed is None:
+                return self.skip(doc, parser)
+            posts, new_state = parsed
+            self.stats['incremental'] += 1
+            # Posts from the last line are replaced as it may have grown
+            posts = { '$literal': posts }
+            if state['count'] > 0:
+                posts = { '$concatArrays': [
+                    { '$slice': [ '$posts', state['count'] ] },
+                    posts
+                ] }
+            return UpdateOne(
+                filter={ '_id': doc['_id'], 'posts_state.prefix': state['prefix'] },
+                update=[ { '$set': {
+                    'posts': posts,
+                    'posts_fingerprint': fingerprint,
+                    'posts_state': { '$literal': new_state }
+                } } ]
+            )
+        parsed = self.parse(parser)
+        if parsed is None:
+            return self.skip(doc, parser)
+        posts, new_state = parsed
+        self.stats['full'] += 1
         dct = {
-            '_id': _id,
-            'posts': posts
+            '_id': doc['_id'],
+            'posts': posts,
+            'posts_fingerprint': fingerprint,
+            'posts_state': new_state
         }
-        op = model._.dct_to_update(dct, **update_kws)
+        op = self.model._.dct_to_update(dct, **self.update_kws)
         return op
 
-    ops = filter(None, map(make_update_op, cursor))
-    for info in model._.bulk_write(ops, n=n, **kwds):
-        info.pop('upserted', None)
+    def parse(self, parser, start=0, state=None):
+        """Parse posts and record parser state at the beginning
+        of the last line, which may still grow.
+
+        Returns ``None`` if parser budgets were exceeded.
+        """
+        offset = parser.get_last_line()
+        posts = list(parser.parse_posts(start, offset, state=state))
+        if parser.exceeded:
+            return None
+        new_state = {
+            'offset': offset,
+            'prefix': WikiParser.fingerprint(parser.source[:offset]),
+            **parser.get_state()
+        }
+        posts += parser.parse_posts(offset, state=new_state)
+        if parser.exceeded:
+            return None
+        if self.compact:
+            for post in posts:
+                del post['content']
+        return posts, new_state
+
+    def skip(self, doc, parser):
+        """Record page skipped because of exceeding parser budgets."""
+        self.skipped.append({ '_id': doc['_id'], 'reason': parser.exceeded })
+
+
+def _get_posts_cursor(model, query, position=None):
+    """Get cursor over pages for parsing posts sorted by `_id`.
+
+    Pages up to `position` (the last processed `_id`) are skipped.
+    """
+    if position is not None:
+        query = { '$and': [ query, { '_id': { '$gt': position } } ] }
+    return model._.aggregate(
+        { '$match': query },
+        { '$sort': { '_id': 1 } },
+        { '$project': {
+            'source_text': 1,
+            'posts_fingerprint': 1,
+            'posts_state': 1
+        } },
+        _.PageSource.lookup(),
+        allowDiskUse=True
+    )
+
+
+def _parse_posts_shard(args):
+    updater, query, job, n, kwds = args
+    model = updater.model
+    WikiParser.parse_timestamp.reset()
+    stats = Counter()
+    checkpoint = _Checkpointer(job)
+    if checkpoint.done:
+        return stats, updater.skipped
+    cursor = _get_posts_cursor(model, query, checkpoint.position)
+    ops = checkpoint.track((doc['_id'], updater(doc)) for doc in cursor)
+    for info in model._.bulk_write(ops, n=n, on_batch=checkpoint.on_batch, **kwds):
+        stats.update({
+            k: v for k, v in info.items()
+            if k in _STATS_KEYS
+        })
+    stats.update(updater.stats)
+    stats.update({
+        f"ts_{k}": v for k, v in WikiParser.parse_timestamp.stats.items()
+    })
+    stats['skipped'] = len(updater.skipped)
+    checkpoint.finish()
+    return stats, updater.skipped
+
+
+def move_sources(query=None, inline=False, n=1000, job=None, **kwds):
+    """Move page sources between `source_text` and compressed
+    :py:class:`wikiminer.mongo.models.PageSource` documents.
+
+    Sources are written to the target first and removed from the source
+    only afterwards, so the job can be safely interrupted and rerun.
+    Inline sources take precedence when reading, so pages updated
+    in the meantime are never lost.
+
+    Parameters
+    ----------
+    query : dict, optional
+        Raw query for selecting pages.
+    inline : bool
+        Should sources be moved back to `source_text`.
+        By default inline sources are compressed and moved out.
+    n : int
+        Number of pages processed in one batch.
+    job : str, optional
+        Job id. If provided then the last `_id` of each processed
+        batch is recorded and rerunning the job resumes from there.
+    **kwds :
+        Passed to :py:func:`dzeta.compress.compress`.
+    """
+    checkpoint = _Checkpointer(job)
+    if checkpoint.done:
+        return
+    flt = { 'source_text': { '$ne': None } }
+    if inline:
+        flt = { 'source_text': None }
+    if query:
+        flt = { '$and': [ query, flt ] }
+    if checkpoint.position is not None:
+        flt = { '$and': [ flt, { '_id': { '$gt': checkpoint.position } } ] }
+    pipeline = [
+        { '$match': flt },
+        { '$sort': { '_id': 1 } },
+        { '$project': { 'source_text': 1 } }
+    ]
+    if inline:
+        pipeline.append(_.PageSource.lookup())
+    cursor = _.Page._.aggregate(*pipeline, allowDiskUse=True)
+    totals = Counter()
+    for docs in chunked(cursor, n):
+        if inline:
+            docs = [ d for d in docs if d['source'] ]
+            first = [
+                UpdateOne(
+                    { '_id': d['_id'], 'source_text': None },
+                    { '$set': { 'source_text': _get_source_text(d) } }
+                )
+                for d in docs
+            ]
+            second = [ DeleteOne({ '_id': d['_id'] }) for d in docs ]
+            models = (_.Page, _.PageSource)
+        else:
+            first = [
+                _.PageSource._.dct_to_update(
+                    _.PageSource.from_text(d['_id'], d['source_text'], **kwds) \
+                        .to_mongo().to_dict()
+                )
+                for d in docs
+            ]
+            # Pages updated in the meantime keep their new sources
+            second = [
+                UpdateOne(
+                    { '_id': d['_id'], 'source_text': d['source_text'] },
+                    { '$unset': { 'source_text': '' } }
+                )
+                for d in docs
+            ]
+            models = (_.PageSource, _.Page)
+        for model, ops in zip(models, (first, second)):
+            if ops:
+                list(model._.bulk_write(ops, ordered=False))
+        totals['pages'] += len(docs)
+        print(f"\rMoved {totals['pages']} sources", end="")
+        if docs:
+            checkpoint.position = docs[-1]['_id']
+            checkpoint.save()
+    print()
+    checkpoint.finish()
+
+
+def _get_source_text(doc):
+    """Get source text from a raw page document.
+
+    Inline `source_text` is used if it exists. Otherwise it is
+    decompressed from sources joined with
+    :py:meth:`wikiminer.mongo.models.PageSource.lookup`
+    or fetched from the database.
+    """
+    source = doc.get('source_text')
+    if source is not None:
+        return source
+    sources = doc.get('source')
+    if sources is None:
+        sources = list(_.PageSource.objects(pk=doc['_id']).as_pymongo())
+    return decompress(sources[0]['data']) if sources else ''
+
+
+@attr.s
+class _Checkpointer:
+    """Record progress of a job after each acknowledged batch.
+
+    Positions of consecutive items are queued by :py:meth:`track`
+    and the position of the last item of every acknowledged batch
+    is saved in :py:class:`wikiminer.mongo.models.Checkpoint`.
+    Nothing is recorded if `job` is ``None``.
+    """
+    job = attr.ib(default=None)
+    position = attr.ib(init=False, default=None)
+    done = attr.ib(init=False, default=False)
+    positions = attr.ib(init=False, factory=deque)
+
+    def __attrs_post_init__(self):
+        if self.job is None:
+            return
+        checkpoint = _.Checkpoint.objects(pk=self.job).first()
+        if checkpoint is None:
+            return
+        self.position = checkpoint.position
+        self.done = checkpoint.done
+        if self.done:
+            print(f"Job '{self.job}' is already finished")
+        elif self.position is not None:
+            print(f"Resuming job '{self.job}' from {self.position}")
+
+    def track(self, items):
+        """Iterate over items of ``(position, item)`` pairs.
+
+        Items which are ``None`` are skipped.
+        """
+        for position, item in items:
+            if item is None:
+                continue
+            if self.job is not None:
+                self.positions.append(position)
+            yield item
+
+    def on_batch(self, batch, info):
+        """Save position of the last item of an acknowledged batch."""
+        if self.job is None:
+            return
+        for _i in range(len(batch)):
+            self.position = self.positions.popleft()
+        self.save({ '$inc': {
+            f"info.{k}": v for k, v in info.items()
+            if k in _STATS_KEYS
+        } })
+
+    def finish(self):
+        """Mark job as finished."""
+        if self.job is None:
+            return
+        self.done = True
+        self.save()
+
+    def save(self, update=None):
+        """Save checkpoint."""
+        if self.job is None:
+            return
+        update = update or {}
+        update['$set'] = {
+            'position': self.position,
+            'done': self.done,
+            'timestamp_updated': datetime.utcnow()
+        }
+        _.Checkpoint._.get_collection().update_one(
+            { '_id': self.job }, update, upsert=True
+        )
+
+
+def sync_indexes(models=None, drop=False, stats=True):
+    """Sync indexes declared in models with the server.
+
+    Missing indexes are built and changed, undeclared and unused
+    indexes are reported
+    (see :py:meth:`dzeta.db.mongo.MongoModelInterface.sync_indexes`).
+    Every collection is processed once, also when it is shared
+    by several models.
+
+    Parameters
+    ----------
+    models : iterable of interfaced mongoengine collections, optional
+        Models to sync. All models in :py:mod:`wikiminer.mongo.models`
+        are synced if ``None``.
+    drop : bool
+        Should undeclared indexes be dropped.
+    stats : bool
+        Should unused indexes be reported based on ``$indexStats``.
+        Usage is counted since the last restart of a server,
+        so it may be not representative after a recent one.
+    """
+    if models is None:
+        models = [ getattr(_.mongo.models, name) for name in _.mongo.models.__all__ ]
+    collections = set()
+    for model in models:
+        name = model._get_collection_name()
+        if name in collections:
+            continue
+        collections.add(name)
+        info = model._.sync_indexes(drop=drop, stats=stats)
         print(info)
 
 
-def get_direct_communication(filepath=None, **kwds):
+def get_direct_communication(filepath=None, content=False,
+                             alias=EXPORT_ALIAS, **kwds):
     """Get direct communication per user from userpages.
 
     Parameters
@@ -243,9 +1131,36 @@ def get_direct_communication(filepath=None, **kwds):
     filepath : str, optional
         Filepath for saving results as JSON lines.
         A cursor is returned if not provided.
+    content : bool
+        Should content of posts be included.
+        Content of compact posts is sliced from page sources
+        (also from ones moved out of line, see :py:func:`move_sources`)
+        and it is ``None`` if a source changed since posts were parsed.
+        Documents are then returned by a generator instead of a cursor.
+    alias : str
+        Alias of the connection used for reading.
+        By default it is the export connection, which may read
+        from secondaries. The default connection is used
+        if `alias` is not registered (see `mongo_aliases` setting).
     **kwds :
         Additional options for the aggregation pipeline.
     """
+    page_fields = {
+        '_id': 0,
+        'page_id': '$_id',
+        'page': '$title',
+        'user_name': 1,
+        'ns': 1,
+        'posts': 1
+    }
+    if content:
+        # Sources are decompressed and sliced on the client
+        posts_stage = _.PageSource.lookup()
+        page_fields.update(source=1, source_text=1, posts_fingerprint=1)
+    else:
+        posts_stage = { '$project': {
+            'posts.content': 0
+        } }
     pipeline = []
     pipeline.append({ '$project': {
         '_id': 0,
@@ -260,38 +1175,49 @@ def get_direct_communication(filepath=None, **kwds):
         'from': _.UserPage._.get_collection().name,
         'let': { 'user_name': '$user_name' },
         'pipeline': [
-            { '$match': { '$expr': {
-                '$and': [
-                    { '$eq': [ '$_cls', 'Page.UserPage' ] },
-                    { '$in': [ '$ns', [2, 3] ] },
-                    { '$eq': [ '$user_name', '$$user_name' ] }
-                ]
-            } } },
-            { '$project': {
-                'posts.content': 0
+            # Plain equality on `_cls` so `{ _cls, user_name }` index is used
+            { '$match': {
+                '_cls': _.UserPage._class_name,
+                'ns': { '$in': [2, 3] },
+                '$expr': { '$eq': [ '$user_name', '$$user_name' ] }
             } },
-            { '$project': {
-                '_id': 0,
-                'page_id': '$_id',
-                'page': '$title',
-                'user_name': 1,
-                'ns': 1,
-                'posts': 1
-            } }
+            posts_stage,
+            { '$project': page_fields }
         ],
         'as': 'userpage'
     } })
 
-    cursor = _.User.objects.aggregate(*pipeline, **{ 'allowDiskUse': True, **kwds })
+    cursor = _.User._.aggregate(
+        *pipeline, alias=alias, **{ 'allowDiskUse': True, **kwds }
+    )
+    if content:
+        cursor = map(_add_posts_content, cursor)
 
     if filepath:
-        with open(filepath, 'x') as handle:
+        with open(filepath, 'xb') as handle:
             for doc in tqdm(cursor):
-                handle.write(json.dumps(doc, default=str)+"\n")
+                handle.write(codec.dumpb(doc)+b"\n")
     return cursor
 
 
-def get_page_assessments(filepath=None, **kwds):
+def _add_posts_content(doc):
+    """Add content of compact posts to a direct communication document."""
+    for page in doc['userpage']:
+        fingerprint = page.pop('posts_fingerprint', None)
+        source = valid = None
+        for post in page.get('posts', ()):
+            if post.get('content') is not None or post.get('start') is None:
+                continue
+            if valid is None:
+                source = _get_source_text({ '_id': page['page_id'], **page })
+                valid = is_compact_source(source, fingerprint)
+            post['content'] = source[post['start']:post['end']] if valid else None
+        page.pop('source', None)
+        page.pop('source_text', None)
+    return doc
+
+
+def get_page_assessments(filepath=None, alias=EXPORT_ALIAS, **kwds):
     """Get page assessment data.
 
     Parameters
@@ -299,10 +1225,13 @@ def get_page_assessments(filepath=None, **kwds):
     filepath : str, optional
         Filepath for saving results as JSON lines.
         A cursor is returned if not provided.
+    alias : str
+        Alias of the connection used for reading.
+        See :py:func:`get_direct_communication`.
     **kwds :
         Additional options for the aggregation pipeline
     """
-    cursor = _.Page.objects.aggregate(
+    cursor = _.Page._.aggregate(
         { '$match': {
             '_cls': _.Page._class_name,
             'ns': 0,
@@ -337,11 +1266,12 @@ def get_page_assessments(filepath=None, **kwds):
             'title': 1,
             'assessments': 1
         } },
+        alias=alias,
         **{ 'allowDiskUse': True, **kwds }
     )
 
     if filepath:
-        with open(filepath, 'x') as handle:
+        with open(filepath, 'xb') as handle:
             for doc in tqdm(cursor):
-                handle.write(json.dumps(doc, default=str)+"\n")
+                handle.write(codec.dumpb(doc)+b"\n")
     return cursor
@@ -45,7 +45,7 @@ class ApiPageAssessments(ApiSpider):
         if self.args.ns is not None:
             query['ns'] = self.args.ns
 
-        cursor = _.Page.objects.aggregate(
+        cursor = _.Page._.aggregate(
             { '$match': query },
             { '$project': { '_id': 1} }
         )
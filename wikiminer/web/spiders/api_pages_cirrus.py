@@ -46,15 +46,15 @@ class ApiPagesCirrus(ApiSpider):
             query['_cls'] = self.args.model
         if self.args.ns is not None:
             query['ns'] = self.args.ns
+        pipeline = [ { '$match': query } ]
         if self.args.missing_only:
-            query['source_text'] = {
-                '$exists': False,
-                '$in': [ None, [] ]
-            }
-        for chunk in chunked(_.Page.objects(__raw__=query).only('_id'), n=self.args.limit):
+            pipeline.extend(_.PageSource.missing())
+        pipeline.append({ '$project': { '_id': 1 } })
+        cursor = _.Page._.aggregate(*pipeline)
+        for chunk in chunked(cursor, n=self.args.limit):
             url = self.make_query(
                 prop='cirrusdoc',
-                pageids='|'.join(str(doc.pk) for doc in chunk),
+                pageids='|'.join(str(doc['_id']) for doc in chunk),
                 **kwds
             )
             yield Request(url)
@@ -46,13 +46,11 @@ class ApiUserpagesCirrus(ApiPagesCirrus):
             'as': 'pages'
         } }
         if self.args.missing_only:
-            lookup['$lookup']['pipeline'][0]['$match'].update(
-                source_text={ '$exists': False, '$in': [ None, [] ] }
-            )
+            lookup['$lookup']['pipeline'][1:1] = _.PageSource.missing()
         add_fields = { '$addFields': { 'pages': '$pages._id' } }
         unwind = { '$unwind': '$pages' }
 
-        cursor = _.User.objects.aggregate(
+        cursor = _.User._.aggregate(
             { '$match': query }, project, lookup, add_fields, unwind,
             allowDiskUse=True
         )
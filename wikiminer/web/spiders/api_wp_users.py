@@ -56,7 +56,7 @@ class ApiWpUsers(ApiSpider):
 
     def make_start_requests(self, **kwds):
         bots = self.get_bots()
-        cursor = _.WikiProjectPage.objects.aggregate(
+        cursor = _.WikiProjectPage._.aggregate(
             { '$match': { '_cls': 'Page.WikiProjectPage' } },
             { '$unwind': '$posts' },
             { '$group': {